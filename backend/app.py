@@ -3,18 +3,32 @@ Hugging Face Spaces entry point
 This file is used by Hugging Face Spaces to run the FastAPI application
 """
 import os
+
+# Each worker process runs its own model; keep BLAS/OpenMP single-threaded so
+# N workers don't each spawn cpu_count() threads and fight over the cores
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+os.environ.setdefault("MKL_NUM_THREADS", "1")
+
+# Persist UMAP's Numba-compiled kernels so restarted workers skip the JIT
+os.environ.setdefault(
+    "NUMBA_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cache", "numba")
+)
+
 import uvicorn
-from app.main import app
 
 if __name__ == "__main__":
     # Hugging Face Spaces uses PORT environment variable (defaults to 7860)
     port = int(os.environ.get("PORT", 7860))
     host = os.environ.get("HOST", "0.0.0.0")
+    # Every worker loads its own copy of the embedding model, so default to a
+    # single worker and scale out explicitly with WEB_CONCURRENCY
+    workers = int(os.environ.get("WEB_CONCURRENCY", 1))
     
     uvicorn.run(
         "app.main:app",
         host=host,
         port=port,
+        workers=workers,
         log_level="info"
     )
-
@@ -3,6 +3,7 @@ Chat Endpoint
 Handles conversational interactions with users to collect preferences
 """
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from app.models.schemas import ChatRequest, ChatResponse, ChatMessage
 from app.services.llm import LLMService
 from app.api.deps import get_llm_service
@@ -34,6 +35,27 @@ async def chat(
         raise HTTPException(status_code=500, detail=f"Chat processing failed: {str(e)}")
 
 
+@router.post("/stream")
+async def chat_stream(
+    request: ChatRequest,
+    llm_service: LLMService = Depends(get_llm_service)
+):
+    """
+    Process chat message, streaming the reply as newline-delimited JSON
+    
+    Each line is either {"type": "token", "content": ...} with the next piece of
+    the assistant's message while the LLM is generating, or the final {"type": "response", "data": ChatResponse} carrying
+    the extracted preferences and ready_for_recommendation flag.
+    """
+    return StreamingResponse(
+        llm_service.stream_chat(
+            messages=request.messages,
+            current_preferences=request.user_preferences
+        ),
+        media_type="application/x-ndjson"
+    )
+
+
 @router.post("/reset")
 async def reset_chat():
     """Reset conversation state"""
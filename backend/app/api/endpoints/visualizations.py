@@ -2,7 +2,7 @@
 Visualizations Endpoint
 Handles embedding space visualization data
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from typing import Optional
 from app.models.schemas import (
     VisualizationResponse,
@@ -25,6 +25,13 @@ async def get_embedding_visualization(
     Uses UMAP to project high-dimensional embeddings to 2D for visualization.
     """
     try:
+        if not include_user:
+            # The catalog projection is static, so serve the pre-serialized payload
+            return Response(
+                content=recommender.get_visualization_json(),
+                media_type="application/json"
+            )
+        
         visualization_data = await recommender.get_visualization_data(
             include_user_point=include_user
         )
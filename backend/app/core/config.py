@@ -4,6 +4,7 @@ Application Configuration
 from pydantic_settings import BaseSettings
 from pydantic import field_validator
 from typing import List, Union
+from functools import lru_cache
 import os
 from pathlib import Path
 
@@ -46,16 +47,30 @@ class Settings(BaseSettings):
     # ML Settings
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
     EMBEDDING_DIMENSION: int = 384  # Default for all-MiniLM-L6-v2
+    EMBEDDING_BACKEND: str = "torch"  # torch, onnx or openvino (onnx/openvino need optimum installed)
     TOP_K_RECOMMENDATIONS: int = 3
+    RECOMMENDATION_CACHE_SIZE: int = 4096  # Rankings memoized per distinct preferences
+    EMBEDDING_BATCH_WINDOW_MS: float = 5.0  # Coalesce concurrent preference encodes within this window
+    EMBEDDING_MAX_BATCH: int = 16
+    USER_EMBEDDING_CACHE_SIZE: int = 1024  # Preference-text embeddings memoized per worker
+    EMBEDDING_BATCH_SIZE: int = 64  # Batch size when encoding the whole catalog
+    EMBEDDING_COMPILE: bool = False  # torch.compile the model at startup (slower boot, faster encodes)
+    TORCH_NUM_THREADS: int = 1  # Per worker process; workers already use one core each
     
     # Groq Settings
     GROQ_API_KEY: str = ""
     GROQ_MODEL: str = "llama-3.1-70b-versatile"  # or mixtral-8x7b-32768
+    GROQ_FAST_MODEL: str = "llama-3.1-8b-instant"  # Opening turns with no preferences yet; empty to always use GROQ_MODEL
+    GROQ_MAX_TOKENS: int = 250  # The JSON reply envelope is ~150 tokens with every preference filled
+    CHAT_HISTORY_WINDOW: int = 6  # Most recent chat messages sent to the LLM each turn
+    LLM_MAX_CONCURRENCY: int = 8  # In-flight Groq requests per worker
+    CHAT_CACHE_SIZE: int = 1024  # LLM replies memoized per (preferences, last message)
     
     # UMAP Settings
     UMAP_N_NEIGHBORS: int = 15
     UMAP_MIN_DIST: float = 0.1
     UMAP_N_COMPONENTS: int = 2
+    UMAP_APPROX_USER_TRANSFORM: bool = True  # Place the user point from its nearest mice instead of UMAP.transform
     
     class Config:
         env_file = "../.env"  # Look for .env in project root
@@ -64,10 +79,16 @@ class Settings(BaseSettings):
         extra = "ignore"  # Ignore extra fields in .env that aren't defined in Settings
 
 
-settings = Settings()
+@lru_cache()
+def get_settings() -> Settings:
+    """Get or create Settings singleton (parses .env and creates data dirs once)"""
+    settings = Settings()
+    
+    # Ensure directories exist
+    settings.DATA_DIR.mkdir(parents=True, exist_ok=True)
+    settings.CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    return settings
 
 
-# Ensure directories exist
-settings.DATA_DIR.mkdir(parents=True, exist_ok=True)
-settings.CACHE_DIR.mkdir(parents=True, exist_ok=True)
+settings = get_settings()
 
@@ -1,16 +1,38 @@
 """
 FastAPI Application Entry Point
 """
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from app.core.config import settings
 from app.api.endpoints import chat, recommendations, visualizations
+from app.api.deps import (
+    get_data_loader,
+    get_embedding_service,
+    get_recommender_service,
+    get_llm_service,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm service singletons once per worker so the first request isn't cold"""
+    get_data_loader().load_data()
+    get_embedding_service().load_model()
+    get_recommender_service().warmup()
+    llm_service = get_llm_service()
+    yield
+    await llm_service.close()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
     description="AI-driven peripheral recommendation system",
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # CORS Configuration for Next.js frontend
@@ -2,83 +2,158 @@
 Data Loader Service
 Loads and manages mouse dataset
 """
+import os
 import pandas as pd
+import numpy as np
 import json
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 from app.core.config import settings
 
 
+@lru_cache(maxsize=1)
+def _read_dataset(dataset_path: Path, mtime: float) -> pd.DataFrame:
+    """
+    Parse the dataset once per process
+    
+    Keyed on the CSV's mtime, so every DataLoader shares one frame and an
+    edited file is picked up on the next load_data() / reload_data()
+    """
+    parquet_path = settings.CACHE_DIR / f"{dataset_path.stem}.parquet"
+    if parquet_path.exists() and parquet_path.stat().st_mtime >= mtime:
+        try:
+            return pd.read_parquet(parquet_path, engine='pyarrow')
+        except Exception as e:
+            print(f"Failed to read Parquet dataset cache: {e}. Re-reading the CSV...")
+    
+    # Arrow's multithreaded CSV reader; columns stay NumPy-backed for the
+    # vectorized filters and column arrays built on top of this frame
+    df = pd.read_csv(dataset_path, engine='pyarrow')
+    # Write to a temp name and rename so a concurrent worker never reads a partial file
+    try:
+        tmp_path = parquet_path.with_suffix(f".{os.getpid()}.tmp")
+        df.to_parquet(tmp_path, engine='pyarrow', compression='zstd')
+        os.replace(tmp_path, parquet_path)
+    except Exception as e:
+        print(f"Failed to cache dataset as Parquet: {e}")
+    return df
+
+
 class DataLoader:
     """Loads and caches mouse dataset"""
     
     def __init__(self):
         self._data: Optional[pd.DataFrame] = None
         self._mice_list: Optional[List[Dict[str, Any]]] = None
+        self._columns: Optional[Dict[str, np.ndarray]] = None
+        self._name_index: Optional[Dict[str, int]] = None
+        self._info: Optional[Dict[str, Any]] = None
     
     def load_data(self) -> pd.DataFrame:
-        """Load mouse dataset from CSV"""
+        """Load mouse dataset (from the Parquet copy when it is newer than the CSV)"""
         if self._data is None:
             try:
-                self._data = pd.read_csv(settings.DATASET_PATH)
-                print(f"Loaded {len(self._data)} mice from dataset")
+                csv_mtime = settings.DATASET_PATH.stat().st_mtime
             except FileNotFoundError:
                 raise FileNotFoundError(
                     f"Dataset not found at {settings.DATASET_PATH}. "
                     "Please ensure the data file exists."
                 )
+            self._data = _read_dataset(settings.DATASET_PATH, csv_mtime)
+            print(f"Loaded {len(self._data)} mice from dataset")
         return self._data
     
+    def get_columns(self) -> Dict[str, np.ndarray]:
+        """
+        Get the dataset column-wise as {column name: numpy array}
+        
+        Built once; batch code (text building, filters, visualization) should
+        index these arrays instead of materializing a dict per row
+        """
+        if self._columns is None:
+            df = self.load_data()
+            self._columns = {col: df[col].to_numpy() for col in df.columns}
+        return self._columns
+    
+    def get_mouse_count(self) -> int:
+        """Get number of mice in the dataset"""
+        return len(self.load_data())
+    
+    def get_mouse(self, index: int) -> Dict[str, Any]:
+        """Build the dictionary for a single mouse on demand (missing values become None)"""
+        mouse = {}
+        for col, values in self.get_columns().items():
+            value = values[index]
+            # Match to_dict('records'): plain Python scalars rather than numpy ones
+            if isinstance(value, np.generic):
+                value = value.item()
+            # NaN is the only value not equal to itself; callers test `is None` instead of np.isnan
+            if isinstance(value, float) and value != value:
+                value = None
+            mouse[col] = value
+        return mouse
+    
     def get_mice_list(self) -> List[Dict[str, Any]]:
-        """Get mice as list of dictionaries"""
+        """Get mice as list of dictionaries (prefer get_columns / get_mouse in hot paths)"""
         if self._mice_list is None:
             df = self.load_data()
             self._mice_list = df.to_dict('records')
         return self._mice_list
     
     def get_mouse_by_name(self, name: str) -> Optional[Dict[str, Any]]:
-        """Get specific mouse by name"""
-        mice = self.get_mice_list()
-        for mouse in mice:
-            if mouse.get('name', '').lower() == name.lower():
-                return mouse
-        return None
+        """Get specific mouse by name (case-insensitive)"""
+        if self._name_index is None:
+            # Build the lookup once; the first mouse wins if names collide
+            self._name_index = {}
+            for i, mouse_name in enumerate(self.get_columns().get('Name', [])):
+                if isinstance(mouse_name, str):
+                    self._name_index.setdefault(mouse_name.lower(), i)
+        index = self._name_index.get(name.lower())
+        return self.get_mouse(index) if index is not None else None
     
     def get_dataset_info(self) -> Dict[str, Any]:
-        """Get dataset statistics and info"""
-        df = self.load_data()
-        return {
-            "total_mice": len(df),
-            "columns": list(df.columns),
-            "brands": df['brand'].nunique() if 'brand' in df.columns else 0,
-            "price_range": {
-                "min": float(df['price'].min()) if 'price' in df.columns else None,
-                "max": float(df['price'].max()) if 'price' in df.columns else None,
-            } if 'price' in df.columns else None
-        }
+        """Get dataset statistics and info (computed once; the dataset is immutable after load)"""
+        if self._info is None:
+            df = self.load_data()
+            has_price = 'Price' in df.columns
+            self._info = {
+                "total_mice": len(df),
+                "columns": list(df.columns),
+                "brands": int(df['Brand'].nunique()) if 'Brand' in df.columns else 0,
+                "price_range": {
+                    "min": float(df['Price'].min()),
+                    "max": float(df['Price'].max()),
+                } if has_price else None
+            }
+        return self._info
     
     def filter_by_budget(self, budget_min: Optional[float] = None, 
                         budget_max: Optional[float] = None) -> pd.DataFrame:
         """Filter mice by budget constraints"""
         df = self.load_data()
         
-        if 'price' not in df.columns:
+        if 'Price' not in df.columns:
             return df
         
-        # Filter out NaN prices
-        df_filtered = df[df['price'].notna()]
+        # One fused mask over the price column, then a single slice
+        price = df['Price'].to_numpy(dtype=float)
+        mask = ~np.isnan(price)
         
         if budget_min is not None:
-            df_filtered = df_filtered[df_filtered['price'] >= budget_min]
+            mask &= price >= budget_min
         
         if budget_max is not None:
-            df_filtered = df_filtered[df_filtered['price'] <= budget_max]
+            mask &= price <= budget_max
         
-        return df_filtered
+        return df[mask]
     
     def reload_data(self):
         """Force reload of dataset"""
         self._data = None
         self._mice_list = None
+        self._columns = None
+        self._name_index = None
+        self._info = None
         self.load_data()
 
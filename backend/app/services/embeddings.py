@@ -2,13 +2,36 @@
 Embedding Service
 Generates vector embeddings for mice and user preferences
 """
+import asyncio
+import hashlib
+import os
+from collections import OrderedDict
 import numpy as np
+import pandas as pd
 import json
+import torch
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Optional, Tuple
 from sentence_transformers import SentenceTransformer
 from app.core.config import settings
 from app.models.schemas import UserPreferences
+from app.utils.mouse_text import MOUSE_TEXT_VERSION, TEXT_COLUMNS, frame_to_texts
+
+
+def dataset_fingerprint(dataset_path: Path, model_name: str) -> str:
+    """
+    Fingerprint the embedding model, the mouse text format and the exact dataset contents
+    
+    Stored in the embeddings meta file so edits, reorders, a different model
+    or a new MOUSE_TEXT_VERSION invalidate the cache even when the row count
+    is unchanged
+    """
+    digest = hashlib.sha256(model_name.encode())
+    digest.update(b"\0")
+    digest.update(f"mouse_text_v{MOUSE_TEXT_VERSION}".encode())
+    digest.update(b"\0")
+    digest.update(Path(dataset_path).read_bytes())
+    return digest.hexdigest()
 
 
 class EmbeddingService:
@@ -16,71 +39,77 @@ class EmbeddingService:
     
     def __init__(self):
         self.model = None
+        torch.set_num_threads(settings.TORCH_NUM_THREADS)
         self._mouse_embeddings_cache: Optional[Dict[str, np.ndarray]] = None
+        # Concurrent encodes on CPU just oversubscribe the cores; allow a few on GPU
+        self._encode_semaphore = asyncio.Semaphore(4 if torch.cuda.is_available() else 1)
+        # Preference texts waiting to be encoded together in the next micro-batch
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._batch_task: Optional[asyncio.Task] = None
+        # LRU of preference text -> (read-only) user embedding
+        self._user_embedding_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
     
     def load_model(self):
         """Lazy load the embedding model"""
         if self.model is None:
-            print(f"Loading embedding model: {settings.EMBEDDING_MODEL}")
-            self.model = SentenceTransformer(settings.EMBEDDING_MODEL)
+            print(f"Loading embedding model: {settings.EMBEDDING_MODEL} ({settings.EMBEDDING_BACKEND} backend)")
+            self.model = SentenceTransformer(
+                settings.EMBEDDING_MODEL,
+                device="cuda" if torch.cuda.is_available() else "cpu",
+                backend=settings.EMBEDDING_BACKEND
+            )
+            # FP16 halves memory traffic on the GPU with no visible change in ranking quality
+            if settings.EMBEDDING_BACKEND == "torch" and self.model.device.type == "cuda":
+                self.model.half()
+            if settings.EMBEDDING_COMPILE and settings.EMBEDDING_BACKEND == "torch":
+                self._compile_model()
             print("Embedding model loaded successfully")
     
+    def _compile_model(self):
+        """
+        Compile the transformer forward pass with torch.compile
+        
+        Compilation happens lazily on the first call, so run one warm-up encode
+        here and fall back to eager mode if the toolchain isn't available
+        """
+        transformer = self.model[0]
+        eager_model = transformer.auto_model
+        try:
+            transformer.auto_model = torch.compile(eager_model, dynamic=True)
+            self.model.encode("warm-up", convert_to_numpy=True)
+            print("Embedding model compiled with torch.compile")
+        except Exception as e:
+            transformer.auto_model = eager_model
+            print(f"torch.compile failed ({e}); using eager mode")
+    
     def generate_text_embedding(self, text: str) -> np.ndarray:
         """Generate embedding for a single text"""
         self.load_model()
-        embedding = self.model.encode(text, convert_to_numpy=True)
+        embedding = self.model.encode(text, convert_to_numpy=True, normalize_embeddings=True)
         return embedding
     
     def generate_batch_embeddings(self, texts: List[str]) -> np.ndarray:
         """Generate embeddings for multiple texts"""
         self.load_model()
-        embeddings = self.model.encode(texts, convert_to_numpy=True, show_progress_bar=True)
+        # Unit-length rows let every consumer score cosine similarity with a plain dot product
+        embeddings = self.model.encode(
+            texts,
+            batch_size=settings.EMBEDDING_BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
         return embeddings
     
-    def mouse_to_text(self, mouse: Dict[str, Any]) -> str:
+    def mice_to_texts(self, columns: Dict[str, np.ndarray], count: int) -> List[str]:
         """
-        Convert mouse data to descriptive text for embedding
+        Convert every mouse to descriptive text for embedding
         
-        Combines all relevant features into a semantic text representation
+        Uses the same builder as data/scripts/generate_embeddings.py over the
+        dataset's own (capitalized) columns, so both produce identical texts
         """
-        parts = []
-        
-        # Basic info
-        if 'name' in mouse:
-            parts.append(f"Mouse: {mouse['name']}")
-        if 'brand' in mouse:
-            parts.append(f"Brand: {mouse['brand']}")
-        
-        # Physical properties
-        if 'weight' in mouse and pd.notna(mouse['weight']):
-            weight = float(mouse['weight'])
-            weight_desc = "lightweight" if weight < 70 else "medium weight" if weight < 90 else "heavy"
-            parts.append(f"Weight: {weight}g ({weight_desc})")
-        
-        if 'shape' in mouse and pd.notna(mouse['shape']):
-            parts.append(f"Shape: {mouse['shape']}")
-        
-        # Performance
-        if 'dpi_max' in mouse and pd.notna(mouse['dpi_max']):
-            parts.append(f"Max DPI: {mouse['dpi_max']}")
-        
-        if 'sensor' in mouse and pd.notna(mouse['sensor']):
-            parts.append(f"Sensor: {mouse['sensor']}")
-        
-        # Connectivity
-        if 'wireless' in mouse and pd.notna(mouse['wireless']):
-            conn = "Wireless" if mouse['wireless'] else "Wired"
-            parts.append(f"Connection: {conn}")
-        
-        # Grip compatibility
-        if 'grip_compatibility' in mouse and pd.notna(mouse['grip_compatibility']):
-            parts.append(f"Grip types: {mouse['grip_compatibility']}")
-        
-        # Genre suitability
-        if 'genre' in mouse and pd.notna(mouse['genre']):
-            parts.append(f"Best for: {mouse['genre']}")
-        
-        return ". ".join(parts)
+        df = pd.DataFrame({col: columns[col] for col in TEXT_COLUMNS if col in columns}, index=range(count))
+        return frame_to_texts(df)
     
     def preferences_to_text(self, preferences: UserPreferences) -> str:
         """
@@ -123,10 +152,10 @@ class EmbeddingService:
         
         return ". ".join(parts)
     
-    def generate_mouse_embeddings(self, mice: List[Dict[str, Any]], 
+    def generate_mouse_embeddings(self, columns: Dict[str, np.ndarray], count: int,
                                   force_regenerate: bool = False) -> np.ndarray:
         """
-        Generate embeddings for all mice in dataset
+        Generate embeddings for all `count` mice in the dataset's column arrays
         
         Caches results to avoid recomputation
         """
@@ -136,11 +165,20 @@ class EmbeddingService:
         # Try to load from cache
         if not force_regenerate and cache_file.exists() and cache_meta_file.exists():
             try:
-                embeddings = np.load(cache_file)
+                # Memory-map: pages are read on demand, and the recommender's float32
+                # copy is filled straight from the page cache instead of a second buffer
+                embeddings = np.load(cache_file, mmap_mode='r', allow_pickle=False)
                 with open(cache_meta_file, 'r') as f:
                     meta = json.load(f)
                 
-                if meta.get('count') == len(mice) and meta.get('model') == settings.EMBEDDING_MODEL:
+                # Meta files written before fingerprints existed fall back to count + model
+                fingerprint = meta.get('fingerprint')
+                fresh = (
+                    fingerprint == dataset_fingerprint(settings.DATASET_PATH, settings.EMBEDDING_MODEL)
+                    if fingerprint else
+                    meta.get('count') == count and meta.get('model') == settings.EMBEDDING_MODEL
+                )
+                if fresh:
                     print(f"Loaded {len(embeddings)} mouse embeddings from cache")
                     return embeddings
             except Exception as e:
@@ -148,18 +186,30 @@ class EmbeddingService:
         
         # Generate new embeddings
         print("Generating mouse embeddings...")
-        texts = [self.mouse_to_text(mouse) for mouse in mice]
+        texts = self.mice_to_texts(columns, count)
         embeddings = self.generate_batch_embeddings(texts)
         
-        # Save to cache
+        # Save to cache. Other workers may have the old file memory-mapped, so never
+        # rewrite it in place: write temp names and rename over it (vectors first,
+        # then the meta file that vouches for them)
         try:
-            np.save(cache_file, embeddings)
-            with open(cache_meta_file, 'w') as f:
+            tmp_cache = cache_file.with_suffix(f".{os.getpid()}.tmp")
+            tmp_meta = cache_meta_file.with_suffix(f".{os.getpid()}.tmp")
+            # C-contiguous float32, the same layout generate_embeddings.py writes, so the
+            # recommender can keep the memory-mapped cache without a copy
+            with open(tmp_cache, 'wb') as f:
+                np.save(f, np.ascontiguousarray(embeddings, dtype=np.float32), allow_pickle=False)
+            with open(tmp_meta, 'w') as f:
                 json.dump({
-                    'count': len(mice),
+                    'count': count,
                     'model': settings.EMBEDDING_MODEL,
-                    'dimension': embeddings.shape[1]
+                    'dimension': embeddings.shape[1],
+                    'dtype': 'float32',
+                    'text_version': MOUSE_TEXT_VERSION,
+                    'fingerprint': dataset_fingerprint(settings.DATASET_PATH, settings.EMBEDDING_MODEL)
                 }, f)
+            os.replace(tmp_cache, cache_file)
+            os.replace(tmp_meta, cache_meta_file)
             print("Mouse embeddings cached successfully")
         except Exception as e:
             print(f"Failed to cache embeddings: {e}")
@@ -170,8 +220,65 @@ class EmbeddingService:
         """Generate embedding for user preferences"""
         text = self.preferences_to_text(preferences)
         return self.generate_text_embedding(text)
-
-
-# Import pandas for notna checks
-import pandas as pd
-
+    
+    async def generate_user_embedding_async(self, preferences: UserPreferences) -> np.ndarray:
+        """
+        Generate embedding for user preferences without blocking the event loop
+        
+        Repeated preference texts are answered from an LRU; concurrent misses are
+        coalesced into micro-batches that run in a worker thread, bounded by the
+        encode semaphore
+        """
+        text = self.preferences_to_text(preferences)
+        cached = self._user_embedding_cache.get(text)
+        if cached is not None:
+            self._user_embedding_cache.move_to_end(text)
+            return cached
+        
+        embedding = await self._encode_coalesced(text)
+        # Shared between callers, so freeze it rather than copy on every hit
+        embedding.setflags(write=False)
+        self._user_embedding_cache[text] = embedding
+        if len(self._user_embedding_cache) > settings.USER_EMBEDDING_CACHE_SIZE:
+            self._user_embedding_cache.popitem(last=False)
+        return embedding
+    
+    async def _encode_coalesced(self, text: str) -> np.ndarray:
+        """Queue a text for the next micro-batch and wait for its embedding"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((text, future))
+        if self._batch_task is None or self._batch_task.done():
+            self._batch_task = asyncio.create_task(self._run_batches())
+        return await future
+    
+    async def _run_batches(self):
+        """
+        Drain pending texts in micro-batches
+        
+        Waits one batching window so concurrent requests can join, then encodes
+        each batch with a single forward pass in a worker thread
+        """
+        await asyncio.sleep(settings.EMBEDDING_BATCH_WINDOW_MS / 1000)
+        
+        while self._pending:
+            batch = self._pending[:settings.EMBEDDING_MAX_BATCH]
+            del self._pending[:settings.EMBEDDING_MAX_BATCH]
+            texts = [text for text, _ in batch]
+            
+            try:
+                async with self._encode_semaphore:
+                    embeddings = await asyncio.to_thread(self._encode_batch, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            for (_, future), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+    
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        """Encode a micro-batch of preference texts in one forward pass"""
+        self.load_model()
+        return self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True, normalize_embeddings=True)
@@ -2,29 +2,162 @@
 LLM Service
 Handles conversation and preference extraction using Groq API
 """
-from groq import Groq
+from groq import AsyncGroq
+from collections import OrderedDict
+import asyncio
+import hashlib
 import json
-from typing import List, Optional
+import re
+from typing import AsyncIterator, List, Optional, Tuple
 from app.models.schemas import ChatMessage, ChatResponse, UserPreferences
 from app.core.config import settings
 from app.core.prompts import CHAT_SYSTEM_PROMPT, FALLBACK_GREETING
 
 
+# The system prompt is constant, so its message payload is built once at import
+SYSTEM_MESSAGE = {"role": "system", "content": CHAT_SYSTEM_PROMPT}
+
+# Dollar amounts / bare numbers in a budget answer (e.g. "$50 to $100")
+_BUDGET_RE = re.compile(r'\$?(\d+)')
+
+
+def _keyword_matcher(table):
+    """
+    Build a matcher for a (substring, value) table listed in priority order
+    
+    Every keyword occurrence is found in one regex pass (the lookahead lets
+    matches overlap), then the highest-priority keyword found wins -- the same
+    result as testing `keyword in message` for each entry in turn
+    """
+    pattern = re.compile("(?=(" + "|".join(re.escape(keyword) for keyword, _ in table) + "))")
+    priority = {keyword: i for i, (keyword, _) in enumerate(table)}
+    
+    def match(message: str):
+        found = {m.group(1) for m in pattern.finditer(message)}
+        if not found:
+            return None
+        return table[min(priority[keyword] for keyword in found)][1]
+    
+    return match
+
+
+# Fallback keyword tables, in the order the rule-based handler checks them
+_match_hand_size = _keyword_matcher((
+    ("small", "small"), ("medium", "medium"), ("med", "medium"), ("large", "large"), ("big", "large"),
+))
+_match_grip_type = _keyword_matcher((
+    ("palm", "palm"), ("claw", "claw"), ("fingertip", "fingertip"), ("finger", "fingertip"),
+))
+_match_genre = _keyword_matcher((
+    ("fps", "fps"), ("shooter", "fps"),
+    ("moba", "moba"), ("league", "moba"), ("dota", "moba"),
+    ("mmo", "mmo"),
+    ("battle royale", "battle_royale"), ("fortnite", "battle_royale"), ("apex", "battle_royale"),
+    ("general", "general"), ("everything", "general"), ("all", "general"),
+))
+_match_wireless = _keyword_matcher((("wireless", True), ("wired", False)))
+
+# Preference lists and maps used in the prompt and the programmatic next-question fix
+REQUIRED_PREFS = ('hand_size', 'grip_type', 'genre', 'sensitivity', 'budget_min', 'budget_max', 'weight_preference', 'wireless_preference')
+QUESTION_MAP = {
+    'hand_size': "What's your hand size? (e.g., 19cm x 10cm or small/medium/large)",
+    'grip_type': "What's your preferred grip type? (palm, claw, fingertip, or hybrid)",
+    'genre': "What games do you mainly play? (fps, moba, mmo, battle_royale, or general)",
+    'sensitivity': "What's your preferred mouse sensitivity? (low, medium, or high)",
+    'budget_min': "What's your budget range for a gaming mouse? (e.g., $50 to $100)",
+    'budget_max': "What's your budget range for a gaming mouse? (e.g., $50 to $100)",
+    'weight_preference': "Is your preferred mouse weight light (<65g), medium (65-85g), or heavy (>85g)?",
+    'wireless_preference': "Do you prefer wired or wireless connection?"
+}
+
+
+class _MessageFieldStream:
+    """
+    Incrementally decode the "message" string out of a streamed JSON reply
+    
+    feed() takes raw completion text and returns the newly decoded part of the
+    message value, so the assistant's reply can be shown while the rest of the
+    object (preferences, ready flag) is still being generated
+    """
+    _START_RE = re.compile(r'"message"\s*:\s*"')
+    _ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+    
+    def __init__(self):
+        self._buffer = ""
+        self._pos: Optional[int] = None  # Next undecoded character of the message value
+        self._done = False
+    
+    def feed(self, text: str) -> str:
+        self._buffer += text
+        if self._done:
+            return ""
+        if self._pos is None:
+            match = self._START_RE.search(self._buffer)
+            if not match:
+                return ""
+            self._pos = match.end()
+        
+        buffer, i, decoded = self._buffer, self._pos, []
+        while i < len(buffer):
+            char = buffer[i]
+            if char == '"':
+                self._done = True
+                break
+            if char != '\\':
+                decoded.append(char)
+                i += 1
+                continue
+            # Escape sequence: wait for the rest of it if it was split across chunks
+            if i + 1 >= len(buffer):
+                break
+            if buffer[i + 1] != 'u':
+                decoded.append(self._ESCAPES.get(buffer[i + 1], buffer[i + 1]))
+                i += 2
+                continue
+            if i + 6 > len(buffer):
+                break
+            code = int(buffer[i + 2:i + 6], 16)
+            if 0xD800 <= code <= 0xDBFF:
+                # High surrogate: combine with the following low surrogate escape
+                if i + 12 > len(buffer):
+                    break
+                low = int(buffer[i + 8:i + 12], 16)
+                code = 0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)
+                i += 6
+            decoded.append(chr(code))
+            i += 6
+        self._pos = i
+        return "".join(decoded)
+
+
 class LLMService:
     """Handles LLM-powered chat interactions"""
     
     def __init__(self):
         self.client = None
+        # LRU of (preference values, normalized last message) -> LLM ChatResponse
+        self._response_cache: "OrderedDict[Tuple[tuple, str, str], ChatResponse]" = OrderedDict()
+        # LRU of preference values -> (rendered preferences system block, next question type)
+        self._preferences_context_cache: "OrderedDict[tuple, Tuple[Optional[str], Optional[str]]]" = OrderedDict()
+        # Bounds in-flight Groq calls so a burst stays under the provider rate limit
+        self._llm_semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
         self._initialize_client()
     
     def _initialize_client(self):
         """Initialize Groq client if API key is available"""
         if settings.GROQ_API_KEY:
-            self.client = Groq(api_key=settings.GROQ_API_KEY)
+            # One async client per worker: its pooled keep-alive connections are reused
+            # by every chat turn instead of paying a TLS handshake per request
+            self.client = AsyncGroq(api_key=settings.GROQ_API_KEY)
             print(f"Groq client initialized with model: {settings.GROQ_MODEL}")
         else:
             print("Warning: GROQ_API_KEY not set. LLM features will use fallback responses.")
     
+    async def close(self):
+        """Close the Groq client's pooled HTTP connections"""
+        if self.client is not None:
+            await self.client.close()
+    
     async def process_chat(self, messages: List[ChatMessage], 
                           current_preferences: Optional[UserPreferences] = None) -> ChatResponse:
         """
@@ -37,131 +170,257 @@ class LLMService:
         else:
             return await self._process_chat_fallback(messages, current_preferences)
     
-    # app/services/llm.py
-
-    async def _process_chat_with_llm(self, messages: List[ChatMessage],
-                                    current_preferences: Optional[UserPreferences]) -> ChatResponse:
-        """Process chat using Groq LLM"""
+    async def stream_chat(self, messages: List[ChatMessage],
+                          current_preferences: Optional[UserPreferences] = None) -> AsyncIterator[str]:
+        """
+        Process a chat turn, streaming the LLM output as NDJSON lines
         
-        # Define preference lists and maps once for use in prompt and programmatic fix
-        required_prefs = ['hand_size', 'grip_type', 'genre', 'sensitivity', 'budget_min', 'budget_max', 'weight_preference', 'wireless_preference']
-        question_map = {
-            'hand_size': "What's your hand size? (e.g., 19cm x 10cm or small/medium/large)",
-            'grip_type': "What's your preferred grip type? (palm, claw, fingertip, or hybrid)",
-            'genre': "What games do you mainly play? (fps, moba, mmo, battle_royale, or general)",
-            'sensitivity': "What's your preferred mouse sensitivity? (low, medium, or high)",
-            'budget_min': "What's your budget range for a gaming mouse? (e.g., $50 to $100)",
-            'budget_max': "What's your budget range for a gaming mouse? (e.g., $50 to $100)",
-            'weight_preference': "Is your preferred mouse weight light (<65g), medium (65-85g), or heavy (>85g)?",
-            'wireless_preference': "Do you prefer wired or wireless connection?"
-        }
+        Yields {"type": "token", "content": ...} with each new piece of the
+        assistant's message, decoded from the JSON reply while Groq is still
+        generating, then a final {"type": "response", "data": ...} line carrying
+        the same ChatResponse that process_chat returns (its message is
+        authoritative: it may append the next question to the streamed text)
+        """
+        if not (self.client and settings.GROQ_API_KEY):
+            response = await self._process_chat_fallback(messages, current_preferences)
+            yield json.dumps({"type": "response", "data": response.model_dump(mode="json")}) + "\n"
+            return
+        
+        cache_key = self._cache_key(messages, current_preferences)
+        response = self._get_cached_response(cache_key)
+        if response is not None:
+            yield json.dumps({"type": "response", "data": response.model_dump(mode="json")}) + "\n"
+            return
+        
+        try:
+            chat_messages, next_question_type = self._build_chat_messages(messages, current_preferences)
+            
+            parts = []
+            message_stream = _MessageFieldStream()
+            async with self._llm_semaphore:
+                stream = await self.client.chat.completions.create(
+                    model=self._select_model(messages, current_preferences),
+                    messages=chat_messages,
+                    temperature=0.5,
+                    max_tokens=settings.GROQ_MAX_TOKENS,
+                    response_format={"type": "json_object"},
+                    stream=True
+                )
+                
+                async for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        parts.append(delta)
+                        message_delta = message_stream.feed(delta)
+                        if message_delta:
+                            yield json.dumps({"type": "token", "content": message_delta}) + "\n"
+            
+            response = self._parse_llm_response("".join(parts), current_preferences, next_question_type)
+            self._cache_response(cache_key, response)
+        except Exception as e:
+            print(f"Groq API error: {e}")
+            import traceback
+            traceback.print_exc()
+            response = await self._process_chat_fallback(messages, current_preferences)
+        
+        yield json.dumps({"type": "response", "data": response.model_dump(mode="json")}) + "\n"
+    
+    @staticmethod
+    def _select_model(messages: List[ChatMessage],
+                      current_preferences: Optional[UserPreferences]) -> str:
+        """Use the fast model for the opening turns, before any preferences are collected"""
+        if settings.GROQ_FAST_MODEL and len(messages) < 4 and current_preferences is None:
+            return settings.GROQ_FAST_MODEL
+        return settings.GROQ_MODEL
+    
+    @staticmethod
+    def _preferences_key(current_preferences: Optional[UserPreferences]) -> tuple:
+        """Hashable snapshot of the preference values (all fields are scalars, so no serialization needed)"""
+        if current_preferences is None:
+            return ()
+        return tuple(getattr(current_preferences, field) for field in UserPreferences.model_fields)
+    
+    def _cache_key(self, messages: List[ChatMessage],
+                   current_preferences: Optional[UserPreferences]) -> Tuple[tuple, str, str]:
+        """
+        Key a chat turn by the collected preferences, the model that answers it and a
+        digest of the (normalized) history window the LLM actually sees, so the same
+        reply in a different conversation is not served a stale answer
+        """
+        history = hashlib.sha256()
+        for msg in messages[-settings.CHAT_HISTORY_WINDOW:]:
+            history.update(f"{msg.role}\0{' '.join(msg.content.lower().split())}\0".encode("utf-8"))
+        return (self._preferences_key(current_preferences),
+                self._select_model(messages, current_preferences), history.hexdigest())
+    
+    def _get_cached_response(self, key: Tuple[tuple, str, str]) -> Optional[ChatResponse]:
+        """Return a copy of a cached LLM response, if this exact turn was answered before"""
+        cached = self._response_cache.get(key)
+        if cached is None:
+            return None
+        self._response_cache.move_to_end(key)
+        return cached.model_copy(deep=True)
+    
+    def _cache_response(self, key: Tuple[tuple, str, str], response: ChatResponse):
+        """Remember an LLM response, evicting the least recently used beyond CHAT_CACHE_SIZE"""
+        self._response_cache[key] = response.model_copy(deep=True)
+        if len(self._response_cache) > settings.CHAT_CACHE_SIZE:
+            self._response_cache.popitem(last=False)
+    
+    def _build_chat_messages(self, messages: List[ChatMessage],
+                             current_preferences: Optional[UserPreferences]) -> Tuple[List[dict], Optional[str]]:
+        """Build the Groq message list and the type of the next question to ask"""
         
         # --- NEW: Variable to hold the question type being asked ---
         next_question_type = None
         # -----------------------------------------------------------
-
-        try:
-            # Build message history
-            chat_messages = [{"role": "system", "content": CHAT_SYSTEM_PROMPT}]
+        
+        # Build message history: the static system prompt first, then recent turns.
+        # Earlier turns are already captured in the collected-preferences block, so
+        # resending them only grows the prompt
+        chat_messages = [SYSTEM_MESSAGE]
+        history = [{"role": msg.role, "content": msg.content} for msg in messages[-settings.CHAT_HISTORY_WINDOW:]]
+        chat_messages.extend(history[:-1])
+        
+        # Add context about current preferences if available. It changes every turn, so it
+        # goes just before the newest message to keep the prompt prefix byte-identical
+        # for the provider's prompt cache
+        if current_preferences:
+            pref_summary, next_question_type = self._preferences_context(current_preferences)
+            if pref_summary:
+                chat_messages.append({"role": "system", "content": pref_summary})
+        
+        chat_messages.extend(history[-1:])
+        return chat_messages, next_question_type
+    
+    def _preferences_context(self, current_preferences: UserPreferences) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Render the collected-preferences system block and pick the next question type
+        
+        Consecutive turns usually carry the same preferences, so the rendered
+        block is memoized by preference values
+        """
+        key = self._preferences_key(current_preferences)
+        cached = self._preferences_context_cache.get(key)
+        if cached is not None:
+            self._preferences_context_cache.move_to_end(key)
+            return cached
+        
+        pref_summary = None
+        next_question_type = None
+        collected = current_preferences.model_dump(exclude_none=True)
+        if collected:
+            pref_list = "\n".join([f"- {key}: {value}" for key, value in collected.items()])
             
-            # Add context about current preferences if available
-            if current_preferences:
-                collected = current_preferences.model_dump(exclude_none=True)
-                if collected:
-                    pref_list = "\n".join([f"- {key}: {value}" for key, value in collected.items()])
-                    
-                    # Determine what to ask next
-                    missing = [p for p in required_prefs if p not in collected or collected[p] is None]
-                    
-                    next_question_hint = ""
-                    if missing:
-                        next_pref = missing[0]
-                        # --- NEW: Set the question type based on missing preference ---
-                        next_question_type = next_pref 
-                        # -------------------------------------------------------------
-                        next_question_hint = f"\n\nNEXT QUESTION TO ASK: {question_map.get(next_pref, 'Continue asking about preferences')}"
-                    
-                    pref_summary = f"ALREADY COLLECTED PREFERENCES (DO NOT change or override these):\n{pref_list}\n\nOnly ask about preferences that are NOT listed above.{next_question_hint}"
-                    chat_messages.append({"role": "system", "content": pref_summary})
+            # Determine what to ask next
+            missing = [p for p in REQUIRED_PREFS if p not in collected or collected[p] is None]
+            
+            next_question_hint = ""
+            if missing:
+                next_pref = missing[0]
+                # --- NEW: Set the question type based on missing preference ---
+                next_question_type = next_pref 
+                # -------------------------------------------------------------
+                next_question_hint = f"\n\nNEXT QUESTION TO ASK: {QUESTION_MAP.get(next_pref, 'Continue asking about preferences')}"
             
-            # Add conversation history
-            for msg in messages:
-                chat_messages.append({"role": msg.role, "content": msg.content})
+            pref_summary = f"ALREADY COLLECTED PREFERENCES (DO NOT change or override these):\n{pref_list}\n\nOnly ask about preferences that are NOT listed above.{next_question_hint}"
+        
+        self._preferences_context_cache[key] = (pref_summary, next_question_type)
+        if len(self._preferences_context_cache) > settings.CHAT_CACHE_SIZE:
+            self._preferences_context_cache.popitem(last=False)
+        return pref_summary, next_question_type
+    
+    def _parse_llm_response(self, response_content: str,
+                            current_preferences: Optional[UserPreferences],
+                            next_question_type: Optional[str]) -> ChatResponse:
+        """Parse the LLM's JSON reply and merge it into a ChatResponse"""
+        parsed = json.loads(response_content)
+        
+        # Extract data
+        message_text = parsed.get("message", "I'm here to help you find the perfect mouse!")
+        prefs_dict = parsed.get("preferences", {})
+        ready = parsed.get("ready_for_recommendation", False)
+        
+        # --- START FIX: Programmatic enforcement of next question (including next_question_type update) ---
+        # Calculate updated 'missing' list based on the new LLM output
+        # (current preferences are dumped once and reused for the merge below)
+        collected = current_preferences.model_dump(exclude_none=True) if current_preferences else {}
+        all_prefs = dict(collected)
+        # New preferences from LLM response
+        all_prefs.update({k: v for k, v in prefs_dict.items() if v is not None}) 
+        
+        missing_after_update = [p for p in REQUIRED_PREFS if all_prefs.get(p) is None]
+        
+        # Reset next_question_type if we're ready
+        if ready:
+            next_question_type = None
+        
+        if not ready and missing_after_update:
+            next_pref = missing_after_update[0]
+            # --- NEW: Update the question type after the most recent preference extraction ---
+            next_question_type = next_pref 
+            # ---------------------------------------------------------------------------------
+            next_question = QUESTION_MAP.get(next_pref)
+            
+            # Enforce question in message_text (omitted internal logic for brevity)
+            if next_question and '?' not in message_text:
+                separator = " "
+                message_text_stripped = message_text.strip()
+                if message_text_stripped:
+                    last_char = message_text_stripped[-1]
+                    if last_char not in ['.', '!', '?']:
+                        separator = "! "
+                    elif last_char == '.':
+                        separator = " "
+                    
+                    message_text = f"{message_text_stripped}{separator}{next_question}"
+                else:
+                    message_text = next_question
+        
+        # --- END FIX ---
+
+        # Create UserPreferences object, merging with current preferences (omitted for brevity)
+        if current_preferences:
+            # all_prefs already holds current preferences overridden by the LLM's non-null values
+            updated_prefs = UserPreferences(**all_prefs)
+        else:
+            updated_prefs = UserPreferences(**prefs_dict) if prefs_dict else None
+        
+        return ChatResponse(
+            message=ChatMessage(role="assistant", content=message_text),
+            updated_preferences=updated_prefs,
+            ready_for_recommendation=ready,
+            # --- CRITICAL FIX: Pass the determined question type here ---
+            question_type=next_question_type 
+            # -----------------------------------------------------------
+        )
+    
+    async def _process_chat_with_llm(self, messages: List[ChatMessage],
+                                    current_preferences: Optional[UserPreferences]) -> ChatResponse:
+        """Process chat using Groq LLM (identical turns are answered from the response cache)"""
+        cache_key = self._cache_key(messages, current_preferences)
+        cached = self._get_cached_response(cache_key)
+        if cached is not None:
+            return cached
+        
+        try:
+            chat_messages, next_question_type = self._build_chat_messages(messages, current_preferences)
             
             # Call Groq API (omitted for brevity)
-            response = self.client.chat.completions.create(
-                model=settings.GROQ_MODEL,
-                messages=chat_messages,
-                temperature=0.5,
-                max_tokens=500,
-                response_format={"type": "json_object"}
-            )
+            async with self._llm_semaphore:
+                response = await self.client.chat.completions.create(
+                    model=self._select_model(messages, current_preferences),
+                    messages=chat_messages,
+                    temperature=0.5,
+                    max_tokens=settings.GROQ_MAX_TOKENS,
+                    response_format={"type": "json_object"}
+                )
             
             # Parse response
             response_content = response.choices[0].message.content
-            parsed = json.loads(response_content)
-            
-            # Extract data
-            message_text = parsed.get("message", "I'm here to help you find the perfect mouse!")
-            prefs_dict = parsed.get("preferences", {})
-            ready = parsed.get("ready_for_recommendation", False)
-            
-            # --- START FIX: Programmatic enforcement of next question (including next_question_type update) ---
-            # Calculate updated 'missing' list based on the new LLM output
-            all_prefs = {}
-            if current_preferences:
-                all_prefs.update(current_preferences.model_dump(exclude_none=True))
-            # New preferences from LLM response
-            all_prefs.update({k: v for k, v in prefs_dict.items() if v is not None}) 
-            
-            missing_after_update = [p for p in required_prefs if all_prefs.get(p) is None]
-            
-            # Reset next_question_type if we're ready
-            if ready:
-                next_question_type = None
-            
-            if not ready and missing_after_update:
-                next_pref = missing_after_update[0]
-                # --- NEW: Update the question type after the most recent preference extraction ---
-                next_question_type = next_pref 
-                # ---------------------------------------------------------------------------------
-                next_question = question_map.get(next_pref)
-                
-                # Enforce question in message_text (omitted internal logic for brevity)
-                if next_question and '?' not in message_text:
-                    separator = " "
-                    message_text_stripped = message_text.strip()
-                    if message_text_stripped:
-                        last_char = message_text_stripped[-1]
-                        if last_char not in ['.', '!', '?']:
-                            separator = "! "
-                        elif last_char == '.':
-                            separator = " "
-                        
-                        message_text = f"{message_text_stripped}{separator}{next_question}"
-                    else:
-                        message_text = next_question
-            
-            # --- END FIX ---
-
-            # Create UserPreferences object, merging with current preferences (omitted for brevity)
-            if current_preferences:
-                updated_prefs_dict = current_preferences.model_dump(exclude_none=True)
-                for key, value in prefs_dict.items():
-                    if value is not None:
-                        updated_prefs_dict[key] = value
-                updated_prefs = UserPreferences(**updated_prefs_dict)
-            else:
-                updated_prefs = UserPreferences(**prefs_dict) if prefs_dict else None
-            
-            return ChatResponse(
-                message=ChatMessage(role="assistant", content=message_text),
-                updated_preferences=updated_prefs,
-                ready_for_recommendation=ready,
-                # --- CRITICAL FIX: Pass the determined question type here ---
-                question_type=next_question_type 
-                # -----------------------------------------------------------
-            )
+            chat_response = self._parse_llm_response(response_content, current_preferences, next_question_type)
+            self._cache_response(cache_key, chat_response)
+            return chat_response
             
         except Exception as e:
             # Error handling (omitted for brevity)
@@ -192,12 +451,7 @@ class LLMService:
         
         # Simple pattern matching for preferences
         if not prefs.hand_size:
-            if "small" in last_message:
-                prefs.hand_size = "small"
-            elif "medium" in last_message or "med" in last_message:
-                prefs.hand_size = "medium"
-            elif "large" in last_message or "big" in last_message:
-                prefs.hand_size = "large"
+            prefs.hand_size = _match_hand_size(last_message)
             
             if prefs.hand_size:
                 response_text = f"Got it, {prefs.hand_size} hands. What's your grip style? (palm, claw, or fingertip)"
@@ -205,12 +459,7 @@ class LLMService:
                 response_text = "I didn't catch that. Is your hand size small, medium, or large?"
         
         elif not prefs.grip_type:
-            if "palm" in last_message:
-                prefs.grip_type = "palm"
-            elif "claw" in last_message:
-                prefs.grip_type = "claw"
-            elif "fingertip" in last_message or "finger" in last_message:
-                prefs.grip_type = "fingertip"
+            prefs.grip_type = _match_grip_type(last_message)
             
             if prefs.grip_type:
                 response_text = f"{prefs.grip_type.capitalize()} grip noted! What games do you primarily play? (FPS, MOBA, MMO, Battle Royale, or General)"
@@ -218,16 +467,7 @@ class LLMService:
                 response_text = "What grip style do you use? (palm, claw, or fingertip)"
         
         elif not prefs.genre:
-            if "fps" in last_message or "shooter" in last_message:
-                prefs.genre = "fps"
-            elif "moba" in last_message or "league" in last_message or "dota" in last_message:
-                prefs.genre = "moba"
-            elif "mmo" in last_message:
-                prefs.genre = "mmo"
-            elif "battle royale" in last_message or "fortnite" in last_message or "apex" in last_message:
-                prefs.genre = "battle_royale"
-            elif "general" in last_message or "everything" in last_message or "all" in last_message:
-                prefs.genre = "general"
+            prefs.genre = _match_genre(last_message)
             
             if prefs.genre:
                 response_text = f"Great! Do you prefer wireless or wired mice?"
@@ -235,10 +475,7 @@ class LLMService:
                 response_text = "What type of games do you play? (FPS, MOBA, MMO, Battle Royale, or General)"
         
         elif prefs.wireless_preference is None:
-            if "wireless" in last_message:
-                prefs.wireless_preference = True
-            elif "wired" in last_message:
-                prefs.wireless_preference = False
+            prefs.wireless_preference = _match_wireless(last_message)
             
             if prefs.wireless_preference is not None:
                 response_text = "Perfect! What's your budget range? (e.g., '$50 to $100' or 'under $80')"
@@ -247,8 +484,7 @@ class LLMService:
         
         elif not prefs.budget_max:
             # Try to extract budget
-            import re
-            numbers = re.findall(r'\$?(\d+)', last_message)
+            numbers = _BUDGET_RE.findall(last_message)
             if numbers:
                 nums = [float(n) for n in numbers]
                 if len(nums) == 1:
@@ -3,9 +3,14 @@
 Recommender Service
 Core recommendation logic using embeddings and similarity
 """
+import hashlib
+import os
+import threading
+import joblib
 import numpy as np
 import umap
-from typing import List, Optional, Tuple, Any
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Any
 from app.models.schemas import (
     UserPreferences,
     MouseRecommendation,
@@ -18,35 +23,25 @@ from app.models.schemas import (
 )
 from app.services.data_loader import DataLoader
 from app.services.embeddings import EmbeddingService
-from app.utils.similarity import cosine_similarity, top_k_similar
+from app.utils.similarity import top_k_similar
 from app.core.config import settings
 import pandas as pd
 
 
-# Helper function: Assumes top_k_similar_for_all is available in app.utils.similarity
-# It should return indices and scores for the top K neighbors for every row in the embeddings matrix.
-# Since app.utils.similarity is not provided, we will implement the logic here for context.
-def _calculate_all_mouse_edges(embeddings: np.ndarray, k: int) -> List[Tuple[int, int, float]]:
-    """Calculates the top K similarity edges for every mouse."""
-    similarity_matrix = cosine_similarity(embeddings, embeddings)
-    edges = []
-    
-    # Iterate through all mice (source nodes)
-    for i in range(len(similarity_matrix)):
-        # Get similarities for the current mouse (row i)
-        row_similarities = similarity_matrix[i]
-        
-        # Sort indices by similarity in descending order
-        # We exclude the mouse itself (similarity 1.0)
-        top_indices = np.argsort(row_similarities)[::-1][1:k+1] 
-        
-        for target_idx in top_indices:
-            # We enforce a directional edge from lower index to higher index to avoid duplicates (i -> target_idx)
-            # This is a common practice for undirected graphs in force simulations
-            if i < target_idx:
-                edges.append((i, target_idx, row_similarities[target_idx]))
-                
-    return edges
+def _get_value(data: dict, key: str, default=None):
+    """Read a mouse field, treating NaN/None/empty strings as missing"""
+    val = data.get(key, default)
+    # pd.isna works for all types (NaN, None, pd.NA)
+    if pd.isna(val) or val == '' or val is None:
+        return default
+    return val
+
+
+def _weight_class(weight: float) -> str:
+    """Weight class used in reasoning: light < 65g, medium 65-85g, heavy > 85g"""
+    if weight < 65:
+        return "light"
+    return "medium" if weight <= 85 else "heavy"
 
 
 class RecommenderService:
@@ -58,14 +53,96 @@ class RecommenderService:
         self._mouse_embeddings: Optional[np.ndarray] = None
         self._umap_reducer: Optional[umap.UMAP] = None
         self._reduced_embeddings: Optional[np.ndarray] = None
+        self._visualization: Optional[VisualizationResponse] = None
+        self._visualization_json: Optional[bytes] = None
+        self._umap_lock = threading.Lock()
+        self._neighbor_indices: Optional[np.ndarray] = None
+        self._neighbor_similarities: Optional[np.ndarray] = None
+        self._prices: Optional[np.ndarray] = None
+        self._wireless_state: Optional[np.ndarray] = None
+        self._name_to_index: Optional[Dict[str, int]] = None
+        # LRU of (preferences JSON, top_k) -> (mouse indices, scores)
+        self._ranking_cache: "OrderedDict[Tuple[str, int], Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
     
     def _get_mouse_embeddings(self) -> np.ndarray:
-        """Get or generate mouse embeddings"""
+        """Get or generate L2-normalized mouse embeddings"""
         if self._mouse_embeddings is None:
-            mice = self.data_loader.get_mice_list()
-            self._mouse_embeddings = self.embedding_service.generate_mouse_embeddings(mice)
+            embeddings = self.embedding_service.generate_mouse_embeddings(
+                self.data_loader.get_columns(),
+                self.data_loader.get_mouse_count()
+            )
+            
+            # Normalize rows once so cosine similarity is a single matrix-vector product per query
+            # (C-contiguous float32 so BLAS never makes a hidden copy of the matrix per call)
+            embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            if np.allclose(norms, 1.0, atol=1e-4):
+                # Already unit length (a float32 cache written by generate_embeddings.py):
+                # keep the memory-mapped array itself, so workers share its page cache
+                self._mouse_embeddings = embeddings
+            else:
+                norms[norms == 0] = 1.0
+                self._mouse_embeddings = np.ascontiguousarray(embeddings / norms, dtype=np.float32)
         return self._mouse_embeddings
     
+    def warmup(self):
+        """Load the dataset, mouse embeddings, neighbor graph and UMAP projection ahead of the first request"""
+        self._get_mouse_embeddings()
+        self._get_catalog_neighbors()
+        self._get_base_visualization()
+        # A reducer loaded from the cache has never run transform; JIT it now rather
+        # than on the first user request
+        if not settings.UMAP_APPROX_USER_TRANSFORM:
+            self._umap_reducer.transform(self._get_mouse_embeddings()[:1])
+    
+    def _get_catalog_neighbors(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rank every mouse's neighbors by cosine similarity, computed once
+        
+        Returns (indices, similarities), each of shape (N, N - 1) with row i sorted
+        by descending similarity to mouse i and mouse i itself excluded
+        """
+        if self._neighbor_indices is None:
+            mouse_embeddings = self._get_mouse_embeddings()
+            sim_matrix = mouse_embeddings @ mouse_embeddings.T
+            np.fill_diagonal(sim_matrix, -np.inf)
+            
+            # Self sorts last, so dropping the final column excludes it
+            order = np.argsort(-sim_matrix, axis=1, kind='stable')[:, :-1]
+            self._neighbor_indices = order
+            self._neighbor_similarities = np.take_along_axis(sim_matrix, order, axis=1)
+        return self._neighbor_indices, self._neighbor_similarities
+    
+    def _get_name_to_index(self) -> Dict[str, int]:
+        """Map each mouse name to its row index (first occurrence wins), built once"""
+        if self._name_to_index is None:
+            self._name_to_index = {}
+            for i, mouse_name in enumerate(self.data_loader.get_columns()['Name']):
+                self._name_to_index.setdefault(mouse_name, i)
+        return self._name_to_index
+    
+    def _get_prices(self) -> np.ndarray:
+        """Get mouse prices as a float array (NaN where missing), built once"""
+        if self._prices is None:
+            columns = self.data_loader.get_columns()
+            if 'Price' in columns:
+                self._prices = columns['Price'].astype(np.float64)
+            else:
+                self._prices = np.full(self.data_loader.get_mouse_count(), np.nan)
+        return self._prices
+    
+    def _get_wireless_state(self) -> np.ndarray:
+        """Get connectivity as an int8 array (-1 unknown, 0 wired, 1 wireless), built once"""
+        if self._wireless_state is None:
+            columns = self.data_loader.get_columns()
+            if 'Connectivity' in columns:
+                connectivity = columns['Connectivity']
+                known = pd.notna(connectivity) & (connectivity != '')
+                self._wireless_state = np.where(known, connectivity == 'Wireless', -1).astype(np.int8)
+            else:
+                self._wireless_state = np.full(self.data_loader.get_mouse_count(), -1, dtype=np.int8)
+        return self._wireless_state
+    
     def _apply_hard_filters(self, preferences: UserPreferences) -> Optional[np.ndarray]:
         """
         Apply hard filters (non-negotiable requirements) and return valid indices.
@@ -73,10 +150,10 @@ class RecommenderService:
         Hard filters:
         1. Price (budget_min, budget_max)
         2. Connectivity (wireless_preference)
+        
+        Returns None when no filter applies, otherwise the (possibly empty) index array
         """
-        # ... (rest of _apply_hard_filters logic remains unchanged)
-        mice = self.data_loader.get_mice_list()
-        valid_indices = []
+        mouse_count = self.data_loader.get_mouse_count()
         
         # Check if any hard filters are specified
         has_filters = (
@@ -94,55 +171,32 @@ class RecommenderService:
         if preferences.wireless_preference is not None:
             print(f"  - Connection: {'Wireless' if preferences.wireless_preference else 'Wired'}")
         
-        filtered_count = 0
-        for i, mouse in enumerate(mice):
-            mouse_name = mouse.get('Name', 'Unknown')
-            
-            # FILTER 1: Budget (Price)
-            if preferences.budget_min is not None or preferences.budget_max is not None:
-                price = mouse.get('Price')
-                if price is None or np.isnan(price):
-                    filtered_count += 1
-                    continue
-                
-                if preferences.budget_min is not None and price < preferences.budget_min:
-                    filtered_count += 1
-                    continue
-                if preferences.budget_max is not None and price > preferences.budget_max:
-                    filtered_count += 1
-                    continue
-            
-            # FILTER 2: Connectivity (Wireless/Wired)
-            if preferences.wireless_preference is not None:
-                connectivity = mouse.get('Connectivity')
-                is_wireless = connectivity == 'Wireless' if connectivity else None
-                
-                if is_wireless is None:
-                    filtered_count += 1
-                    continue
-                
-                if preferences.wireless_preference and not is_wireless:
-                    filtered_count += 1
-                    continue
-                if not preferences.wireless_preference and is_wireless:
-                    filtered_count += 1
-                    continue
-            
-            # Mouse passed all filters
-            valid_indices.append(i)
+        # One boolean mask over the cached column arrays
+        mask = np.ones(mouse_count, dtype=bool)
+        
+        # FILTER 1: Budget (Price) -- NaN prices compare False, so missing prices drop out
+        if preferences.budget_min is not None or preferences.budget_max is not None:
+            prices = self._get_prices()
+            if preferences.budget_min is not None:
+                mask &= prices >= preferences.budget_min
+            if preferences.budget_max is not None:
+                mask &= prices <= preferences.budget_max
+        
+        # FILTER 2: Connectivity (Wireless/Wired) -- unknown (-1) never equals 0 or 1
+        if preferences.wireless_preference is not None:
+            mask &= self._get_wireless_state() == int(preferences.wireless_preference)
         
-        print(f"[HARD FILTERS] {len(valid_indices)} mice passed, {filtered_count} filtered out (total: {len(mice)})")
-        return np.array(valid_indices) if valid_indices else None
+        valid_indices = np.flatnonzero(mask)
+        print(f"[HARD FILTERS] {len(valid_indices)} mice passed, {mouse_count - len(valid_indices)} filtered out (total: {mouse_count})")
+        return valid_indices
 
 
-    async def recommend(self, preferences: UserPreferences, top_k: int = 3,
-                       include_reasoning: bool = True) -> List[MouseRecommendation]:
-        """
-        Generate top K mouse recommendations
-        """
-        # ... (recommend logic remains unchanged)
-        # Generate user embedding
-        user_embedding = self.embedding_service.generate_user_embedding(preferences)
+    async def _rank_mice(self, preferences: UserPreferences, top_k: int,
+                         user_embedding: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Encode preferences, apply hard filters and return (mouse indices, scores) of the top K"""
+        # Generate user embedding (unless the caller already has it)
+        if user_embedding is None:
+            user_embedding = await self.embedding_service.generate_user_embedding_async(preferences)
         
         # Get mouse embeddings
         mouse_embeddings = self._get_mouse_embeddings()
@@ -152,49 +206,66 @@ class RecommenderService:
         
         if valid_indices is not None and len(valid_indices) == 0:
             # No mice match hard filter constraints
-            return []
-        
-        # Filter embeddings if needed
+            return np.array([], dtype=np.intp), np.array([], dtype=np.float32)
+        
+        # Normalize the query once; mouse rows are already unit length
+        query = np.ascontiguousarray(user_embedding, dtype=np.float32).ravel()
+        query_norm = np.sqrt(np.vdot(query, query))
+        if query_norm > 0:
+            query = query / query_norm
+        
+        # Cosine similarity == dot product on unit vectors. Score the whole contiguous
+        # matrix in one sgemv (no gathered copy of the kept rows), then push filtered-out
+        # mice to -inf so selection works on original indices directly
+        similarities = mouse_embeddings @ query
         if valid_indices is not None:
-            filtered_embeddings = mouse_embeddings[valid_indices]
-        else:
-            filtered_embeddings = mouse_embeddings
-            valid_indices = np.arange(len(mouse_embeddings))
-        
-        # Find top K similar mice
-        similarities = cosine_similarity(user_embedding.reshape(1, -1), filtered_embeddings)[0]
-        top_k_indices, top_k_scores = top_k_similar(similarities, k=min(top_k, len(similarities)))
+            kept = similarities
+            similarities = np.full_like(kept, -np.inf)
+            similarities[valid_indices] = kept[valid_indices]
+            top_k = min(top_k, len(valid_indices))
+        
+        # Find top K similar mice (already original indices; top_k_similar sorts
+        # outright instead of partitioning when top_k covers every score)
+        return top_k_similar(similarities, k=min(top_k, len(similarities)))
+    
+    async def recommend(self, preferences: UserPreferences, top_k: int = 3,
+                       include_reasoning: bool = True,
+                       user_embedding: Optional[np.ndarray] = None) -> List[MouseRecommendation]:
+        """
+        Generate top K mouse recommendations
         
-        # Map back to original indices
-        original_indices = valid_indices[top_k_indices]
+        Pass user_embedding when the caller has already encoded these preferences
+        """
+        # ... (recommend logic remains unchanged)
+        # Identical preferences always rank the same mice, so reuse the last ranking
+        cache_key = (preferences.model_dump_json(), top_k)
+        cached = self._ranking_cache.get(cache_key)
+        if cached is not None:
+            self._ranking_cache.move_to_end(cache_key)
+            original_indices, top_k_scores = cached
+        else:
+            original_indices, top_k_scores = await self._rank_mice(preferences, top_k, user_embedding)
+            self._ranking_cache[cache_key] = (original_indices, top_k_scores)
+            if len(self._ranking_cache) > settings.RECOMMENDATION_CACHE_SIZE:
+                self._ranking_cache.popitem(last=False)
         
-        # Build recommendations
-        mice = self.data_loader.get_mice_list()
+        # Build recommendations (row dicts only for the top K mice)
         recommendations = []
         
         for orig_idx, score in zip(original_indices, top_k_scores):
-            mouse_data = mice[orig_idx]
+            mouse_data = self.data_loader.get_mouse(orig_idx)
             
             # Convert to MouseInfo schema (CSV columns are capitalized)
-            # Helper function to handle NaN values
-            import pandas as pd
-            def get_value(data, key, default=None):
-                val = data.get(key, default)
-                # Handle pandas NaN/None/empty strings using pd.isna which works for all types
-                if pd.isna(val) or val == '' or val is None:
-                    return default
-                return val
-            
             mouse_info = MouseInfo(
-                name=get_value(mouse_data, 'Name', 'Unknown'),
-                brand=get_value(mouse_data, 'Brand', 'Unknown'),
-                price=get_value(mouse_data, 'Price'),
-                weight=get_value(mouse_data, 'Weight (grams)'),
-                dpi_max=get_value(mouse_data, 'DPI'),
-                wireless=mouse_data.get('Connectivity') == 'Wireless' if get_value(mouse_data, 'Connectivity') else None,
-                shape=get_value(mouse_data, 'Shape'),
-                sensor=get_value(mouse_data, 'Sensor'),
-                url=get_value(mouse_data, 'Price_URL')
+                name=_get_value(mouse_data, 'Name', 'Unknown'),
+                brand=_get_value(mouse_data, 'Brand', 'Unknown'),
+                price=_get_value(mouse_data, 'Price'),
+                weight=_get_value(mouse_data, 'Weight (grams)'),
+                dpi_max=_get_value(mouse_data, 'DPI'),
+                wireless=mouse_data.get('Connectivity') == 'Wireless' if _get_value(mouse_data, 'Connectivity') else None,
+                shape=_get_value(mouse_data, 'Shape'),
+                sensor=_get_value(mouse_data, 'Sensor'),
+                url=_get_value(mouse_data, 'Price_URL')
             )
             
             reasoning = None
@@ -218,17 +289,9 @@ class RecommenderService:
         # Check weight preference (CSV column: "Weight (grams)")
         if preferences.weight_preference and 'Weight (grams)' in mouse_data:
             weight = mouse_data['Weight (grams)']
-            if weight and not np.isnan(weight):
-                weight_match = False
-                if preferences.weight_preference == "light" and weight < 65:
-                    weight_match = True
-                elif preferences.weight_preference == "medium" and 65 <= weight <= 85:
-                    weight_match = True
-                elif preferences.weight_preference == "heavy" and weight > 85:
-                    weight_match = True
-                
-                if weight_match:
-                    reasons.append(f"Matches your {preferences.weight_preference} weight preference ({weight}g)")
+            # get_mouse already turned a missing weight into None
+            if weight and _weight_class(weight) == preferences.weight_preference:
+                reasons.append(f"Matches your {preferences.weight_preference} weight preference ({weight}g)")
         
         # Check wireless preference (CSV column: "Connectivity")
         if preferences.wireless_preference is not None and 'Connectivity' in mouse_data:
@@ -249,59 +312,135 @@ class RecommenderService:
         return ". ".join(reasons) if reasons else "Good match based on your overall preferences"
 
     
-    async def get_visualization_data(self, include_user_point: bool = False) -> VisualizationResponse:
-        """Get 2D embedding visualization of all mice"""
-        # ... (get_visualization_data logic remains unchanged)
-        mouse_embeddings = self._get_mouse_embeddings()
+    def _get_base_visualization(self) -> VisualizationResponse:
+        """Fit UMAP and build the catalog visualization once; the projection never changes"""
+        if self._visualization is None:
+            mouse_embeddings = self._get_mouse_embeddings()
+            
+            # Apply UMAP for dimensionality reduction
+            if self._reduced_embeddings is None or self._umap_reducer is None:
+                self._load_or_fit_umap(mouse_embeddings)
+            
+            # Build visualization points
+            names = self.data_loader.get_columns()['Name']
+            mouse_points = []
+            
+            for i, (x, y) in enumerate(self._reduced_embeddings):
+                
+                # NOTE: ForceGraphVisualization uses 'mouse-' prefix for IDs and 'mouse_name' for name.
+                # We must map the name to index for the graph component.
+                mouse_points.append(EmbeddingPoint(
+                    x=float(x),
+                    y=float(y),
+                    mouse_name=names[i] # Changed from 'name' to 'Name' to match CSV header
+                ))
+            
+            self._visualization = VisualizationResponse(
+                mouse_points=mouse_points,
+                user_point=None,
+                recommended_points=None
+            )
+        return self._visualization
+    
+    def _load_or_fit_umap(self, mouse_embeddings: np.ndarray):
+        """
+        Load the fitted UMAP reducer and projection from the cache dir, fitting them if absent
         
-        # Apply UMAP for dimensionality reduction
-        if self._reduced_embeddings is None or self._umap_reducer is None:
+        Files are keyed by a hash of the embedding matrix and the UMAP settings,
+        so restarts and other workers reuse the same fit instead of re-running it
+        """
+        with self._umap_lock:
+            if self._reduced_embeddings is not None and self._umap_reducer is not None:
+                return
+            
+            params = (settings.UMAP_N_NEIGHBORS, settings.UMAP_MIN_DIST, settings.UMAP_N_COMPONENTS)
+            digest = hashlib.blake2b(mouse_embeddings.tobytes(), digest_size=8)
+            digest.update(repr(params).encode())
+            cfg_hash = digest.hexdigest()
+            reducer_file = settings.CACHE_DIR / f"umap_{cfg_hash}.pkl"
+            reduced_file = settings.CACHE_DIR / f"reduced_{cfg_hash}.npy"
+            
+            if reducer_file.exists() and reduced_file.exists():
+                try:
+                    self._umap_reducer = joblib.load(reducer_file)
+                    self._reduced_embeddings = np.load(reduced_file, mmap_mode='r', allow_pickle=False)
+                    print(f"Loaded UMAP projection from cache ({cfg_hash})")
+                    return
+                except Exception as e:
+                    print(f"UMAP cache load failed: {e}. Refitting...")
+            
             self._umap_reducer = umap.UMAP(
                 n_neighbors=settings.UMAP_N_NEIGHBORS,
                 min_dist=settings.UMAP_MIN_DIST,
                 n_components=settings.UMAP_N_COMPONENTS,
-                random_state=42
+                random_state=42,
+                n_jobs=1  # random_state forces serial anyway; explicit to skip the warning
             )
             self._reduced_embeddings = self._umap_reducer.fit_transform(mouse_embeddings)
-        
-        # Build visualization points
-        mice = self.data_loader.get_mice_list()
-        mouse_points = []
-        
-        for i, (x, y) in enumerate(self._reduced_embeddings):
-            mouse_data = mice[i]
-            
-            # Helper function to handle NaN values from recommend method is not needed here, 
-            # as only name is required for visualization point.
             
-            # NOTE: ForceGraphVisualization uses 'mouse-' prefix for IDs and 'mouse_name' for name.
-            # We must map the name to index for the graph component.
-            mouse_points.append(EmbeddingPoint(
-                x=float(x),
-                y=float(y),
-                mouse_name=mouse_data.get('Name', 'Unknown') # Changed from 'name' to 'Name' to match CSV header
-            ))
+            # Write to temp names and rename so a concurrent worker never loads a partial file
+            try:
+                tmp_reducer = reducer_file.with_suffix(f".{os.getpid()}.tmp")
+                tmp_reduced = reduced_file.with_suffix(f".{os.getpid()}.tmp")
+                joblib.dump(self._umap_reducer, tmp_reducer)
+                with open(tmp_reduced, 'wb') as f:
+                    np.save(f, self._reduced_embeddings, allow_pickle=False)
+                os.replace(tmp_reduced, reduced_file)
+                os.replace(tmp_reducer, reducer_file)
+            except Exception as e:
+                print(f"Failed to cache UMAP projection: {e}")
+    
+    def get_visualization_json(self) -> bytes:
+        """Get the catalog visualization serialized to JSON (serialized once, then reused)"""
+        if self._visualization_json is None:
+            self._visualization_json = self._get_base_visualization().model_dump_json().encode()
+        return self._visualization_json
+    
+    async def get_visualization_data(self, include_user_point: bool = False) -> VisualizationResponse:
+        """Get 2D embedding visualization of all mice"""
+        # Shallow copy so callers can attach user/recommended points without touching the cache
+        return self._get_base_visualization().model_copy()
+
+    def _project_user_embedding(self, user_embedding: np.ndarray, k: int = 8) -> np.ndarray:
+        """
+        Place the user embedding in the 2D UMAP space
         
-        return VisualizationResponse(
-            mouse_points=mouse_points,
-            user_point=None,
-            recommended_points=None
-        )
+        UMAP's transform runs an optimization for the single point (hundreds of ms).
+        By default the point is instead put at the softmax-weighted average of its
+        k most similar mice's 2D coordinates, which lands in the same neighborhood
+        """
+        if not settings.UMAP_APPROX_USER_TRANSFORM:
+            return self._umap_reducer.transform(user_embedding.reshape(1, -1))[0]
+        
+        mouse_embeddings = self._get_mouse_embeddings()
+        query = np.asarray(user_embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        if query_norm > 0:
+            query = query / query_norm
+        
+        similarities = mouse_embeddings @ query
+        k = min(k, len(similarities))
+        top = np.argpartition(similarities, -k)[-k:]
+        weights = np.exp((similarities[top] - similarities[top].max()) * 10)
+        weights /= weights.sum()
+        return weights @ np.asarray(self._reduced_embeddings[top], dtype=np.float64)
 
     # ----------------------------------------------------------------------
     # CRITICAL NEW METHOD: Force Graph Data Calculation
     # ----------------------------------------------------------------------
 
-    async def get_visualization_with_user(self, preferences: UserPreferences) -> VisualizationResponse:
+    async def get_visualization_with_user(self, preferences: UserPreferences,
+                                          user_embedding: Optional[np.ndarray] = None) -> VisualizationResponse:
         """Get visualization including user preference point and recommendations"""
         # Get base visualization
         viz_data = await self.get_visualization_data()
         
-        # Generate user embedding and transform it
-        user_embedding = self.embedding_service.generate_user_embedding(preferences)
+        # Generate user embedding once; it places the user point and ranks the recommendations
+        if user_embedding is None:
+            user_embedding = await self.embedding_service.generate_user_embedding_async(preferences)
         
         if self._umap_reducer is not None:
-            user_2d = self._umap_reducer.transform(user_embedding.reshape(1, -1))[0]
+            user_2d = self._project_user_embedding(user_embedding)
             viz_data.user_point = EmbeddingPoint(
                 x=float(user_2d[0]),
                 y=float(user_2d[1]),
@@ -309,24 +448,27 @@ class RecommenderService:
             )
         
         # Get recommendations
-        recommendations = await self.recommend(preferences, top_k=settings.TOP_K_RECOMMENDATIONS)
+        recommendations = await self.recommend(
+            preferences,
+            top_k=settings.TOP_K_RECOMMENDATIONS,
+            user_embedding=user_embedding
+        )
         
         # Find corresponding points for recommended mice
         if recommendations and self._reduced_embeddings is not None:
-            mice = self.data_loader.get_mice_list()
+            name_to_index = self._get_name_to_index()
             recommended_points = []
             
             for rec in recommendations:
                 # Find index of this mouse
-                for i, mouse in enumerate(mice):
-                    if mouse.get('Name') == rec.mouse.name:
-                        x, y = self._reduced_embeddings[i]
-                        recommended_points.append(EmbeddingPoint(
-                            x=float(x),
-                            y=float(y),
-                            mouse_name=rec.mouse.name
-                        ))
-                        break
+                i = name_to_index.get(rec.mouse.name)
+                if i is not None:
+                    x, y = self._reduced_embeddings[i]
+                    recommended_points.append(EmbeddingPoint(
+                        x=float(x),
+                        y=float(y),
+                        mouse_name=rec.mouse.name
+                    ))
             
             viz_data.recommended_points = recommended_points
         
@@ -344,57 +486,45 @@ class RecommenderService:
         Returns:
             Dict with nodes, edges, and metadata
         """
-        from sklearn.metrics.pairwise import cosine_similarity as sklearn_cosine_similarity
-
-        # Get visualization data (UMAP coordinates)
-        viz_data = await self.get_visualization_with_user(preferences)
-
-        
-        # Get embeddings for similarity calculations
-        mouse_embeddings = self._get_mouse_embeddings()
-        
-        # Calculate similarity matrix
-        sim_matrix = sklearn_cosine_similarity(mouse_embeddings)
-        
-        # Build edges: connect each mouse to its k most similar mice
-        edges = []
-        mice = self.data_loader.get_mice_list()
+        # Encode the user once for the visualization, recommendations and user edges
+        user_embedding = await self.embedding_service.generate_user_embedding_async(preferences)
         
-        for i in range(len(sim_matrix)):
-            # Get k most similar (excluding self at index 0)
-            top_k_indices = np.argsort(sim_matrix[i])[::-1][1:k_neighbors+1]
-            
-            for j in top_k_indices:
-                # Only add edge if i < j to avoid duplicates
-                if i < j:
-                    edges.append({
-                        "source": i,
-                        "target": int(j),
-                        "similarity": float(sim_matrix[i][j])
-                    })
+        # Get visualization data (UMAP coordinates)
+        viz_data = await self.get_visualization_with_user(preferences, user_embedding)
+        
+        # Catalog neighbors are ranked once; each request only slices the top k
+        neighbor_indices, neighbor_similarities = self._get_catalog_neighbors()
+        k = max(0, min(k_neighbors, neighbor_indices.shape[1]))
+        targets = neighbor_indices[:, :k]
+        similarities = neighbor_similarities[:, :k]
+        sources = np.broadcast_to(np.arange(len(targets))[:, None], targets.shape)
+        
+        # Only add edge if i < j to avoid duplicates
+        keep = sources < targets
+        edges = [
+            {"source": int(i), "target": int(j), "similarity": float(sim)}
+            for i, j, sim in zip(sources[keep], targets[keep], similarities[keep])
+        ]
         
         # Add edges from user to recommended mice
         user_edges = []
         if viz_data.user_point and viz_data.recommended_points:
+            mouse_embeddings = self._get_mouse_embeddings()
+            name_to_index = self._get_name_to_index()
+            
+            # Score the user against the unit-length mouse rows
+            query = np.asarray(user_embedding, dtype=np.float32).ravel()
+            query_norm = np.sqrt(np.vdot(query, query))
+            if query_norm > 0:
+                query = query / query_norm
+            
             for rec_point in viz_data.recommended_points:
-                # Find index of recommended mouse
-                mouse_idx = next(
-                    (i for i, m in enumerate(mice) if m.get('Name') == rec_point.mouse_name),
-                    None
-                )
+                mouse_idx = name_to_index.get(rec_point.mouse_name)
                 if mouse_idx is not None:
-                    # Calculate similarity between user embedding and this mouse
-                    user_embedding = self.embedding_service.generate_user_embedding(preferences)
-                    mouse_embedding = mouse_embeddings[mouse_idx]
-                    similarity = sklearn_cosine_similarity(
-                        user_embedding.reshape(1, -1), 
-                        mouse_embedding.reshape(1, -1)
-                    )[0][0]
-                    
                     user_edges.append({
                         "source": "user",
                         "target": mouse_idx,
-                        "similarity": float(similarity)
+                        "similarity": float(mouse_embeddings[mouse_idx] @ query)
                     })
         
         return {
@@ -5,7 +5,9 @@ Contains brand information including quality ratings, tier classifications,
 and other metadata for all mouse brands in the dataset.
 """
 
-from typing import Dict, Optional
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional
 from enum import Enum
 
 
@@ -17,23 +19,15 @@ class BrandTier(str, Enum):
     BUDGET = "budget"             # Budget-friendly, less established
 
 
+@dataclass(frozen=True, slots=True)
 class BrandInfo:
-    """Brand metadata"""
-    def __init__(
-        self,
-        name: str,
-        tier: BrandTier,
-        quality_score: float,  # 0.0 to 1.0
-        origin: str,
-        reputation: str,
-        notes: str = ""
-    ):
-        self.name = name
-        self.tier = tier
-        self.quality_score = quality_score
-        self.origin = origin
-        self.reputation = reputation
-        self.notes = notes
+    """Brand metadata (immutable; shared by every lookup)"""
+    name: str
+    tier: BrandTier
+    quality_score: float  # 0.0 to 1.0
+    origin: str
+    reputation: str
+    notes: str = ""
 
 
 # Brand Quality Mapping
@@ -316,9 +310,14 @@ BRAND_DATA: Dict[str, BrandInfo] = {
 
 
 # Simple quality score lookup (for backwards compatibility)
-BRAND_QUALITY_SCORES: Dict[str, float] = {
+BRAND_QUALITY_SCORES: Mapping[str, float] = MappingProxyType({
     brand: info.quality_score for brand, info in BRAND_DATA.items()
-}
+})
+
+# Lowercased brand name -> BrandInfo for case-insensitive lookups (first spelling wins)
+_BRAND_DATA_LOWER: Dict[str, BrandInfo] = {}
+for _brand, _info in BRAND_DATA.items():
+    _BRAND_DATA_LOWER.setdefault(_brand.lower(), _info)
 
 
 def get_brand_info(brand_name: str) -> Optional[BrandInfo]:
@@ -336,12 +335,7 @@ def get_brand_info(brand_name: str) -> Optional[BrandInfo]:
         return BRAND_DATA[brand_name]
     
     # Try case-insensitive match
-    brand_lower = brand_name.lower()
-    for key, info in BRAND_DATA.items():
-        if key.lower() == brand_lower:
-            return info
-    
-    return None
+    return _BRAND_DATA_LOWER.get(brand_name.lower())
 
 
 def get_brand_quality_score(brand_name: str, default: float = 0.5) -> float:
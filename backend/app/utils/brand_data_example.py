@@ -4,6 +4,8 @@ Example Usage of Brand Data
 Shows how to use brand quality scores and metadata in recommendations.
 """
 
+import numpy as np
+
 from app.utils.brand_data import (
     get_brand_info,
     get_brand_quality_score,
@@ -64,20 +66,17 @@ def example_weighted_recommendation():
         print(f"  {mouse['name']}: {mouse['similarity']:.2f}")
     print()
     
-    # Apply brand quality weighting
-    weighted_scores = []
-    for mouse in candidates:
-        brand_score = get_brand_quality_score(mouse['brand'])
-        # Weighted: 70% similarity, 30% brand quality
-        final_score = 0.7 * mouse['similarity'] + 0.3 * brand_score
-        weighted_scores.append({
-            **mouse,
-            'brand_score': brand_score,
-            'final_score': final_score
-        })
+    # Apply brand quality weighting as one vectorized op over the candidates
+    similarities = np.array([mouse['similarity'] for mouse in candidates], dtype=np.float32)
+    brand_scores = np.array([get_brand_quality_score(mouse['brand']) for mouse in candidates], dtype=np.float32)
+    # Weighted: 70% similarity, 30% brand quality
+    final_scores = 0.7 * similarities + 0.3 * brand_scores
     
     # Sort by final score
-    weighted_scores.sort(key=lambda x: x['final_score'], reverse=True)
+    weighted_scores = [
+        {**candidates[i], 'brand_score': float(brand_scores[i]), 'final_score': float(final_scores[i])}
+        for i in np.argsort(-final_scores, kind='stable')
+    ]
     
     print("Weighted scores (70% similarity + 30% brand quality):")
     for mouse in weighted_scores:
@@ -0,0 +1,165 @@
+"""
+Mouse Text Representations
+Builds the descriptive text each mouse is embedded from
+
+Shared by the backend's EmbeddingService and data/scripts/generate_embeddings.py,
+so both embed (and fingerprint) exactly the same texts
+"""
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+# Part of the embeddings cache fingerprint; bump whenever the text format
+# changes so cached vectors built from the old texts are regenerated
+MOUSE_TEXT_VERSION = 1
+
+# Every dataset column build_mouse_text reads
+TEXT_COLUMNS = [
+    'Name', 'Brand', 'Weight (grams)', 'Length (mm)', 'Width (mm)', 'Height (mm)',
+    'Shape', 'Hand compatibility', 'Hump placement', 'Front flare', 'Side curvature',
+    'Thumb rest', 'Ring finger rest', 'Sensor', 'Sensor type', 'DPI',
+    'Polling rate (Hz)', 'Tracking speed (IPS)', 'Connectivity', 'Side buttons',
+    'Switches', 'Switches brand', 'Material', 'Price',
+]
+
+
+def build_mouse_text(values, present, col_idx: dict, has_thumb_rest: Optional[bool] = None,
+                     has_ring_finger_rest: Optional[bool] = None) -> str:
+    """
+    Convert one mouse row to descriptive text for embedding
+    
+    Creates a rich semantic representation combining all relevant features.
+    Takes the row's values and not-null mask as arrays plus a {column: position}
+    map, so callers can precompute the mask for the whole dataset at once.
+    The yes/no rest flags can be precomputed the same way (see rest_flags);
+    when omitted they are read from the row
+    """
+    def get(col):
+        i = col_idx.get(col)
+        return values[i] if i is not None and present[i] else None
+    
+    parts = []
+    
+    # Basic info
+    name = get('Name')
+    if name is not None:
+        parts.append(f"Mouse: {name}")
+    
+    brand = get('Brand')
+    if brand is not None:
+        parts.append(f"Brand: {brand}")
+    
+    # Physical properties
+    weight = get('Weight (grams)')
+    if weight is not None:
+        weight = float(weight)
+        if weight < 40:
+            weight_desc = "ultra-lightweight"
+        elif weight < 65:
+            weight_desc = "lightweight"
+        elif weight < 85:
+            weight_desc = "medium weight"
+        else:
+            weight_desc = "heavy"
+        parts.append(f"Weight: {weight}g ({weight_desc})")
+    
+    # Dimensions
+    for col, label in (('Length (mm)', "Length"), ('Width (mm)', "Width"), ('Height (mm)', "Height")):
+        value = get(col)
+        if value is not None:
+            parts.append(f"{label}: {value}mm")
+    
+    # Shape characteristics
+    for col, label in (
+        ('Shape', "Shape"),
+        ('Hand compatibility', "Hand compatibility"),
+        ('Hump placement', "Hump"),
+        ('Front flare', "Front flare"),
+        ('Side curvature', "Side curvature"),
+    ):
+        value = get(col)
+        if value is not None:
+            parts.append(f"{label}: {value}")
+    
+    # Grip features
+    if has_thumb_rest is None:
+        thumb_rest = get('Thumb rest')
+        has_thumb_rest = thumb_rest is not None and str(thumb_rest).lower() == 'yes'
+    if has_thumb_rest:
+        parts.append("Has thumb rest")
+    
+    if has_ring_finger_rest is None:
+        ring_finger_rest = get('Ring finger rest')
+        has_ring_finger_rest = ring_finger_rest is not None and str(ring_finger_rest).lower() == 'yes'
+    if has_ring_finger_rest:
+        parts.append("Has ring finger rest")
+    
+    # Performance specs
+    for col, label in (('Sensor', "Sensor"), ('Sensor type', "Sensor type"), ('DPI', "Max DPI")):
+        value = get(col)
+        if value is not None:
+            parts.append(f"{label}: {value}")
+    
+    polling_rate = get('Polling rate (Hz)')
+    if polling_rate is not None:
+        parts.append(f"Polling rate: {polling_rate}Hz")
+    
+    tracking_speed = get('Tracking speed (IPS)')
+    if tracking_speed is not None:
+        parts.append(f"Tracking speed: {tracking_speed} IPS")
+    
+    # Connectivity, buttons, switches and material
+    for col, label in (
+        ('Connectivity', "Connection"),
+        ('Side buttons', "Side buttons"),
+        ('Switches', "Switches"),
+        ('Switches brand', "Switch brand"),
+        ('Material', "Material"),
+    ):
+        value = get(col)
+        if value is not None:
+            parts.append(f"{label}: {value}")
+    
+    # Price
+    price = get('Price')
+    if price is not None:
+        price = float(price)
+        if price < 50:
+            price_desc = "budget-friendly"
+        elif price < 100:
+            price_desc = "mid-range"
+        else:
+            price_desc = "premium"
+        parts.append(f"Price: ${price} ({price_desc})")
+    
+    return ". ".join(parts)
+
+
+def rest_flags(df: pd.DataFrame, col: str) -> np.ndarray:
+    """Whether each row's yes/no column reads 'yes', as one vectorized pass"""
+    if col not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    column = df[col]
+    return (column.astype(str).str.lower().eq('yes') & column.notna()).to_numpy()
+
+
+def build_mouse_texts(values: np.ndarray, present: np.ndarray, has_thumb_rest: np.ndarray,
+                      has_ring_finger_rest: np.ndarray, col_idx: dict) -> List[str]:
+    """Convert a block of rows to text (module-level so worker processes can run it)"""
+    return [
+        build_mouse_text(values[i], present[i], col_idx, has_thumb_rest[i], has_ring_finger_rest[i])
+        for i in range(len(values))
+    ]
+
+
+def frame_to_texts(df: pd.DataFrame) -> List[str]:
+    """Convert every row of a dataset frame to text in one serial pass"""
+    return build_mouse_texts(
+        df.to_numpy(dtype=object),
+        df.notna().to_numpy(),
+        rest_flags(df, 'Thumb rest'),
+        rest_flags(df, 'Ring finger rest'),
+        {col: i for i, col in enumerate(df.columns)},
+    )
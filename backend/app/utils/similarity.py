@@ -70,8 +70,15 @@ def top_k_similar(similarities: np.ndarray, k: int = 3) -> Tuple[np.ndarray, np.
     """
     k = min(k, len(similarities))
     
-    # Get indices of top K scores (in descending order)
-    top_indices = np.argsort(similarities)[::-1][:k]
+    if k <= 0:
+        top_indices = np.array([], dtype=np.intp)
+    elif k == len(similarities):
+        # Everything is returned, so just sort it
+        top_indices = np.argsort(-similarities)
+    else:
+        # Partition out the top K in O(n), then sort only those K (descending)
+        top_indices = np.argpartition(-similarities, k - 1)[:k]
+        top_indices = top_indices[np.argsort(-similarities[top_indices])]
     top_scores = similarities[top_indices]
     
     return top_indices, top_scores
@@ -33,21 +33,28 @@ def filter_dataset(input_csv, output_csv):
     print("="*70)
     print(f"Reading: {input_csv}")
     
-    df = pd.read_csv(input_csv)
+    df = pd.read_csv(input_csv, engine='pyarrow')
+    # Brand drives every isin / value_counts / groupby below; as a categorical
+    # those work on small integer codes instead of hashing strings per row
+    df['Brand'] = df['Brand'].astype('category')
     initial_count = len(df)
     print(f"Initial dataset: {initial_count} mice\n")
     
+    # Every rule narrows one boolean mask over the full frame; rows are copied
+    # once at the end instead of rebuilding the DataFrame after each rule
+    keep = pd.Series(True, index=df.index)
+    
     # ========================================
     # RULE 1: Remove mod/kit brands
     # ========================================
     print("[RULE 1] Removing mod/kit brands...")
     mod_brands = ['PMM', 'CryoMods', 'Arbiter', 'Project']
     
-    before = len(df)
-    df = df[~df['Brand'].isin(mod_brands)]
-    removed = before - len(df)
+    before = int(keep.sum())
+    keep &= ~df['Brand'].isin(mod_brands)
+    removed = before - int(keep.sum())
     print(f"  Removed {removed} mice from mod brands")
-    print(f"  Remaining: {len(df)} mice\n")
+    print(f"  Remaining: {int(keep.sum())} mice\n")
     
     # ========================================
     # RULE 1B: Remove low-reputation brands
@@ -60,25 +67,31 @@ def filter_dataset(input_csv, output_csv):
         'Turtle', 'Aigo', 'Arye', 'RK'
     ]
     
-    before = len(df)
-    df = df[~df['Brand'].isin(excluded_brands)]
-    removed = before - len(df)
+    before = int(keep.sum())
+    keep &= ~df['Brand'].isin(excluded_brands)
+    removed = before - int(keep.sum())
     print(f"  Removed {removed} mice from {len(excluded_brands)} excluded brands")
-    print(f"  Remaining: {len(df)} mice\n")
+    print(f"  Remaining: {int(keep.sum())} mice\n")
     
     # ========================================
     # RULE 2: Remove brands with ≤3 mice
     # ========================================
     print("[RULE 2] Removing brands with 3 or fewer mice...")
     
-    # Count mice per brand
-    brand_counts = df['Brand'].value_counts()
+    # Size of each row's brand among mice that passed rule 1, in one groupby
+    # pass; rows already dropped (and missing brands) get NaN and fail the test.
+    # Brands emptied by rule 1 are removed from the categories so they are not
+    # reported as zero-mice brands
+    brands = df['Brand'].where(keep).cat.remove_unused_categories()
+    brand_sizes = brands.groupby(brands, observed=True).transform('size')
     
-    # Brands to keep (>3 mice)
-    brands_to_keep = brand_counts[brand_counts > 3].index.tolist()
+    before = int(keep.sum())
+    brand_counts = brands.value_counts()
+    keep &= brand_sizes > 3
+    kept_counts = brand_counts[brand_counts > 3]
     
-    print(f"  Brands with >3 mice: {len(brands_to_keep)}")
-    print(f"  Brands being removed: {len(brand_counts) - len(brands_to_keep)}")
+    print(f"  Brands with >3 mice: {len(kept_counts)}")
+    print(f"  Brands being removed: {len(brand_counts) - len(kept_counts)}")
     
     # Show brands being removed
     removed_brands = brand_counts[brand_counts <= 3]
@@ -87,11 +100,9 @@ def filter_dataset(input_csv, output_csv):
         for brand, count in removed_brands.items():
             print(f"    - {brand}: {count} mice")
     
-    before = len(df)
-    df = df[df['Brand'].isin(brands_to_keep)]
-    removed = before - len(df)
+    removed = before - int(keep.sum())
     print(f"\n  Removed {removed} mice from small brands")
-    print(f"  Remaining: {len(df)} mice\n")
+    print(f"  Remaining: {int(keep.sum())} mice\n")
     
     # ========================================
     # RULE 3: Remove low-performance mice
@@ -99,66 +110,40 @@ def filter_dataset(input_csv, output_csv):
     print("[RULE 3] Removing low-performance mice...")
     
     # Convert columns to numeric (handle any non-numeric values)
-    df['Weight (grams)'] = pd.to_numeric(df['Weight (grams)'], errors='coerce')
-    df['DPI'] = pd.to_numeric(df['DPI'], errors='coerce')
-    df['Polling rate (Hz)'] = pd.to_numeric(df['Polling rate (Hz)'], errors='coerce')
-    df['Tracking speed (IPS)'] = pd.to_numeric(df['Tracking speed (IPS)'], errors='coerce')
-    
-    # 3a. Weight > 65 grams (ultra-lightweight only)
-    print("  [3a] Removing mice with weight > 65g...")
-    before = len(df)
-    heavy_mice = df[df['Weight (grams)'] > 65]
-    if len(heavy_mice) > 0:
-        print(f"      Examples being removed:")
-        for _, mouse in heavy_mice.head(5).iterrows():
-            print(f"        - {mouse['Name']}: {mouse['Weight (grams)']}g")
-    
-    df = df[df['Weight (grams)'] <= 65]
-    removed = before - len(df)
-    print(f"      Removed: {removed} mice")
-    print(f"      Remaining: {len(df)} mice")
-    
-    # 3b. DPI < 18000 (high-end sensors only)
-    print("\n  [3b] Removing mice with DPI < 18000...")
-    before = len(df)
-    low_dpi = df[df['DPI'] < 18000]
-    if len(low_dpi) > 0:
-        print(f"      Examples being removed:")
-        for _, mouse in low_dpi.head(5).iterrows():
-            print(f"        - {mouse['Name']}: {mouse['DPI']} DPI")
-    
-    df = df[df['DPI'] >= 18000]
-    removed = before - len(df)
-    print(f"      Removed: {removed} mice")
-    print(f"      Remaining: {len(df)} mice")
-    
-    # 3c. Polling rate < 1000 Hz
-    print("\n  [3c] Removing mice with polling rate < 1000 Hz...")
-    before = len(df)
-    low_polling = df[df['Polling rate (Hz)'] < 1000]
-    if len(low_polling) > 0:
-        print(f"      Examples being removed:")
-        for _, mouse in low_polling.head(5).iterrows():
-            print(f"        - {mouse['Name']}: {mouse['Polling rate (Hz)']} Hz")
-    
-    df = df[df['Polling rate (Hz)'] >= 1000]
-    removed = before - len(df)
-    print(f"      Removed: {removed} mice")
-    print(f"      Remaining: {len(df)} mice")
-    
-    # 3d. Tracking speed < 400 IPS (high-performance tracking)
-    print("\n  [3d] Removing mice with tracking speed < 400 IPS...")
-    before = len(df)
-    low_ips = df[df['Tracking speed (IPS)'] < 400]
-    if len(low_ips) > 0:
-        print(f"      Examples being removed:")
-        for _, mouse in low_ips.head(5).iterrows():
-            print(f"        - {mouse['Name']}: {mouse['Tracking speed (IPS)']} IPS")
-    
-    df = df[df['Tracking speed (IPS)'] >= 400]
-    removed = before - len(df)
-    print(f"      Removed: {removed} mice")
-    print(f"      Remaining: {len(df)} mice\n")
+    numeric_cols = ['Weight (grams)', 'DPI', 'Polling rate (Hz)', 'Tracking speed (IPS)']
+    df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric, errors='coerce')
+    
+    # (label, column, unit, failing predicate, passing predicate); missing values
+    # fail the passing predicate without being listed as examples, as before
+    performance_rules = [
+        ("[3a] Removing mice with weight > 65g...", 'Weight (grams)', "g",
+         df['Weight (grams)'] > 65, df['Weight (grams)'] <= 65),
+        ("[3b] Removing mice with DPI < 18000...", 'DPI', " DPI",
+         df['DPI'] < 18000, df['DPI'] >= 18000),
+        ("[3c] Removing mice with polling rate < 1000 Hz...", 'Polling rate (Hz)', " Hz",
+         df['Polling rate (Hz)'] < 1000, df['Polling rate (Hz)'] >= 1000),
+        ("[3d] Removing mice with tracking speed < 400 IPS...", 'Tracking speed (IPS)', " IPS",
+         df['Tracking speed (IPS)'] < 400, df['Tracking speed (IPS)'] >= 400),
+    ]
+    
+    for i, (label, col, unit, fails, passes) in enumerate(performance_rules):
+        if i > 0:
+            print()
+        print(f"  {label}")
+        before = int(keep.sum())
+        examples = df.loc[keep & fails, ['Name', col]].head(5)
+        if len(examples) > 0:
+            print(f"      Examples being removed:")
+            for name, value in examples.itertuples(index=False, name=None):
+                print(f"        - {name}: {value}{unit}")
+        
+        keep &= passes
+        removed = before - int(keep.sum())
+        print(f"      Removed: {removed} mice")
+        print(f"      Remaining: {int(keep.sum())} mice")
+    print()
+    
+    df = df[keep]
     
     # ========================================
     # SAVE RESULTS
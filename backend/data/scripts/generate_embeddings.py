@@ -8,135 +8,77 @@ This script:
 4. Saves embeddings and metadata to cache directory
 
 Usage:
-    python generate_embeddings.py [--model MODEL_NAME] [--force]
+    python generate_embeddings.py [--model MODEL_NAME] [--workers N] [--force]
 """
 
+import os
 import sys
 import argparse
-import json
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import List, Optional, Tuple
 
 import pandas as pd
 import numpy as np
+import torch
 from sentence_transformers import SentenceTransformer
 from tqdm import tqdm
+import orjson
 
 # Add parent directory to path for imports
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from app.core.config import settings
+from app.services.embeddings import dataset_fingerprint
+# The text builder lives in the backend so both embed the same texts
+from app.utils.mouse_text import MOUSE_TEXT_VERSION, build_mouse_texts, rest_flags
 
 
-def mouse_to_text(mouse: dict) -> str:
+# Rows of text built between progress bar updates
+TEXT_PROGRESS_STEP = 256
+
+
+def mice_to_texts(df: pd.DataFrame, workers: int = 1) -> List[str]:
     """
-    Convert mouse data to descriptive text for embedding
+    Convert every mouse in the dataset to descriptive text
     
-    Creates a rich semantic representation combining all relevant features
+    The not-null mask and object values are extracted once for the whole frame
+    instead of a pd.notna call per field per row. With workers > 1 the blocks are
+    built in a process pool (text building is pure Python, so threads would
+    serialize on the GIL); output order is unchanged
     """
-    parts = []
-    
-    # Basic info
-    if 'Name' in mouse and pd.notna(mouse['Name']):
-        parts.append(f"Mouse: {mouse['Name']}")
-    
-    if 'Brand' in mouse and pd.notna(mouse['Brand']):
-        parts.append(f"Brand: {mouse['Brand']}")
-    
-    # Physical properties
-    if 'Weight (grams)' in mouse and pd.notna(mouse['Weight (grams)']):
-        weight = float(mouse['Weight (grams)'])
-        if weight < 40:
-            weight_desc = "ultra-lightweight"
-        elif weight < 65:
-            weight_desc = "lightweight"
-        elif weight < 85:
-            weight_desc = "medium weight"
-        else:
-            weight_desc = "heavy"
-        parts.append(f"Weight: {weight}g ({weight_desc})")
-    
-    # Dimensions
-    if 'Length (mm)' in mouse and pd.notna(mouse['Length (mm)']):
-        parts.append(f"Length: {mouse['Length (mm)']}mm")
-    
-    if 'Width (mm)' in mouse and pd.notna(mouse['Width (mm)']):
-        parts.append(f"Width: {mouse['Width (mm)']}mm")
-    
-    if 'Height (mm)' in mouse and pd.notna(mouse['Height (mm)']):
-        parts.append(f"Height: {mouse['Height (mm)']}mm")
-    
-    # Shape characteristics
-    if 'Shape' in mouse and pd.notna(mouse['Shape']):
-        parts.append(f"Shape: {mouse['Shape']}")
-    
-    if 'Hand compatibility' in mouse and pd.notna(mouse['Hand compatibility']):
-        parts.append(f"Hand compatibility: {mouse['Hand compatibility']}")
-    
-    if 'Hump placement' in mouse and pd.notna(mouse['Hump placement']):
-        parts.append(f"Hump: {mouse['Hump placement']}")
-    
-    if 'Front flare' in mouse and pd.notna(mouse['Front flare']):
-        parts.append(f"Front flare: {mouse['Front flare']}")
-    
-    if 'Side curvature' in mouse and pd.notna(mouse['Side curvature']):
-        parts.append(f"Side curvature: {mouse['Side curvature']}")
-    
-    # Grip features
-    if 'Thumb rest' in mouse and pd.notna(mouse['Thumb rest']):
-        if str(mouse['Thumb rest']).lower() == 'yes':
-            parts.append("Has thumb rest")
-    
-    if 'Ring finger rest' in mouse and pd.notna(mouse['Ring finger rest']):
-        if str(mouse['Ring finger rest']).lower() == 'yes':
-            parts.append("Has ring finger rest")
-    
-    # Performance specs
-    if 'Sensor' in mouse and pd.notna(mouse['Sensor']):
-        parts.append(f"Sensor: {mouse['Sensor']}")
-    
-    if 'Sensor type' in mouse and pd.notna(mouse['Sensor type']):
-        parts.append(f"Sensor type: {mouse['Sensor type']}")
-    
-    if 'DPI' in mouse and pd.notna(mouse['DPI']):
-        parts.append(f"Max DPI: {mouse['DPI']}")
-    
-    if 'Polling rate (Hz)' in mouse and pd.notna(mouse['Polling rate (Hz)']):
-        parts.append(f"Polling rate: {mouse['Polling rate (Hz)']}Hz")
-    
-    if 'Tracking speed (IPS)' in mouse and pd.notna(mouse['Tracking speed (IPS)']):
-        parts.append(f"Tracking speed: {mouse['Tracking speed (IPS)']} IPS")
-    
-    # Connectivity
-    if 'Connectivity' in mouse and pd.notna(mouse['Connectivity']):
-        parts.append(f"Connection: {mouse['Connectivity']}")
-    
-    # Buttons
-    if 'Side buttons' in mouse and pd.notna(mouse['Side buttons']):
-        parts.append(f"Side buttons: {mouse['Side buttons']}")
-    
-    # Switches
-    if 'Switches' in mouse and pd.notna(mouse['Switches']):
-        parts.append(f"Switches: {mouse['Switches']}")
-    
-    if 'Switches brand' in mouse and pd.notna(mouse['Switches brand']):
-        parts.append(f"Switch brand: {mouse['Switches brand']}")
-    
-    # Material
-    if 'Material' in mouse and pd.notna(mouse['Material']):
-        parts.append(f"Material: {mouse['Material']}")
-    
-    # Price
-    if 'Price' in mouse and pd.notna(mouse['Price']):
-        price = float(mouse['Price'])
-        if price < 50:
-            price_desc = "budget-friendly"
-        elif price < 100:
-            price_desc = "mid-range"
+    values = df.to_numpy(dtype=object)
+    present = df.notna().to_numpy()
+    col_idx = {col: i for i, col in enumerate(df.columns)}
+    has_thumb_rest = rest_flags(df, 'Thumb rest')
+    has_ring_finger_rest = rest_flags(df, 'Ring finger rest')
+    
+    # Building a text takes microseconds, so the progress bar is advanced in
+    # blocks rather than per row to keep its bookkeeping out of the loop
+    starts = range(0, len(df), TEXT_PROGRESS_STEP)
+    blocks = [
+        tuple(
+            array[start:start + TEXT_PROGRESS_STEP]
+            for array in (values, present, has_thumb_rest, has_ring_finger_rest)
+        )
+        for start in starts
+    ]
+    texts = []
+    with tqdm(total=len(df), desc="Generating text", mininterval=0.5) as pbar:
+        if workers > 1 and len(blocks) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(blocks))) as executor:
+                block_texts = executor.map(
+                    build_mouse_texts, *zip(*blocks), [col_idx] * len(blocks)
+                )
+                for block in block_texts:
+                    texts.extend(block)
+                    pbar.update(len(block))
         else:
-            price_desc = "premium"
-        parts.append(f"Price: ${price} ({price_desc})")
-    
-    return ". ".join(parts)
+            for block_arrays in blocks:
+                block = build_mouse_texts(*block_arrays, col_idx)
+                texts.extend(block)
+                pbar.update(len(block))
+    return texts
 
 
 def load_dataset(dataset_path: Path) -> pd.DataFrame:
@@ -146,35 +88,42 @@ def load_dataset(dataset_path: Path) -> pd.DataFrame:
     if not dataset_path.exists():
         raise FileNotFoundError(f"Dataset not found at {dataset_path}")
     
-    df = pd.read_csv(dataset_path)
+    # Arrow's multithreaded CSV reader (same engine as the backend's DataLoader)
+    df = pd.read_csv(dataset_path, engine='pyarrow')
     print(f"Loaded {len(df)} mice from dataset")
     print(f"Columns: {list(df.columns)}")
     
     return df
 
 
-def generate_embeddings(df: pd.DataFrame, model_name: str, batch_size: int = 32) -> np.ndarray:
+def generate_embeddings(df: pd.DataFrame, model_name: str, batch_size: Optional[int] = None,
+                        workers: int = 1) -> Tuple[np.ndarray, List[str]]:
     """
     Generate embeddings for all mice in dataset
     
     Args:
         df: DataFrame with mouse data
         model_name: SentenceTransformer model name
-        batch_size: Batch size for encoding
+        batch_size: Batch size for encoding (default: 256 on GPU, 64 on CPU)
+        workers: Processes used to build the texts (1 builds them inline)
     
     Returns:
-        numpy array of embeddings (n_mice, embedding_dim)
+        Tuple of (embeddings of shape (n_mice, embedding_dim), texts that were embedded)
     """
-    print(f"\nLoading embedding model: {model_name}")
-    model = SentenceTransformer(model_name)
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    if batch_size is None:
+        batch_size = 256 if device == "cuda" else 64
+    
+    print(f"\nLoading embedding model: {model_name} ({device})")
+    model = SentenceTransformer(model_name, device=device)
+    # FP16 doubles matmul throughput on the GPU; vectors are normalized either way
+    if device == "cuda":
+        model.half()
     print(f"Model loaded. Embedding dimension: {model.get_sentence_embedding_dimension()}")
     
     # Convert all mice to text
     print("\nConverting mice to descriptive text...")
-    texts = []
-    for idx, row in tqdm(df.iterrows(), total=len(df), desc="Generating text"):
-        text = mouse_to_text(row.to_dict())
-        texts.append(text)
+    texts = mice_to_texts(df, workers)
     
     # Generate embeddings
     print(f"\nGenerating embeddings for {len(texts)} mice...")
@@ -188,19 +137,33 @@ def generate_embeddings(df: pd.DataFrame, model_name: str, batch_size: int = 32)
     
     print(f"Embeddings generated: shape {embeddings.shape}")
     
-    return embeddings
+    return embeddings, texts
+
+
+def write_json(path: Path, obj) -> None:
+    """Write obj as indented JSON"""
+    with open(path, 'wb') as f:
+        f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
 
 
-def save_embeddings(embeddings: np.ndarray, df: pd.DataFrame, model_name: str, 
-                   data_dir: Path):
+def read_json(path: Path):
+    """Read a JSON artifact written by write_json"""
+    with open(path, 'rb') as f:
+        return orjson.loads(f.read())
+
+
+def save_embeddings(embeddings: np.ndarray, df: pd.DataFrame, texts: List[str], model_name: str,
+                   data_dir: Path, dataset_path: Path):
     """
     Save embeddings and metadata to data directory
     
     Args:
         embeddings: numpy array of embeddings
         df: DataFrame with mouse data (for validation)
+        texts: Text representations the embeddings were generated from
         model_name: Model name used
         data_dir: Directory to save files (backend/data/)
+        dataset_path: CSV the embeddings were generated from (fingerprinted in the metadata)
     """
     # Ensure data directory exists
     data_dir.mkdir(parents=True, exist_ok=True)
@@ -208,29 +171,39 @@ def save_embeddings(embeddings: np.ndarray, df: pd.DataFrame, model_name: str,
     # Save embeddings as numpy array
     embeddings_file = data_dir / "FINAL_EMBEDDINGS.npy"
     print(f"\nSaving embeddings to: {embeddings_file}")
-    np.save(embeddings_file, embeddings)
+    # C-contiguous float32 so the backend can memory-map it and hand it to BLAS without a copy.
+    # Running backend workers may have the old file mapped, so it is replaced by a
+    # rename rather than rewritten in place
+    tmp_embeddings_file = embeddings_file.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_embeddings_file, 'wb') as f:
+        np.save(f, np.ascontiguousarray(embeddings, dtype=np.float32), allow_pickle=False)
+    os.replace(tmp_embeddings_file, embeddings_file)
+    
+    # Optionally save text representations for debugging (before the metadata,
+    # which names this file so preview_texts.py knows the texts are current)
+    texts_file = data_dir / "FINAL_EMBEDDINGS_texts.json"
+    print(f"Saving text representations to: {texts_file}")
+    write_json(texts_file, texts)
     
     # Save metadata
     metadata = {
         'count': len(embeddings),
         'model': model_name,
         'dimension': embeddings.shape[1],
+        'dtype': 'float32',
         'normalized': True,
+        'text_version': MOUSE_TEXT_VERSION,
+        'fingerprint': dataset_fingerprint(dataset_path, model_name),
+        'texts_file': texts_file.name,
         'mouse_names': df['Name'].tolist() if 'Name' in df.columns else [],
         'dataset_columns': list(df.columns)
     }
     
     meta_file = data_dir / "FINAL_EMBEDDINGS_meta.json"
     print(f"Saving metadata to: {meta_file}")
-    with open(meta_file, 'w') as f:
-        json.dump(metadata, f, indent=2)
-    
-    # Optionally save text representations for debugging
-    texts_file = data_dir / "FINAL_EMBEDDINGS_texts.json"
-    print(f"Saving text representations to: {texts_file}")
-    texts = [mouse_to_text(row.to_dict()) for _, row in df.iterrows()]
-    with open(texts_file, 'w') as f:
-        json.dump(texts, f, indent=2)
+    tmp_meta_file = meta_file.with_suffix(f".{os.getpid()}.tmp")
+    write_json(tmp_meta_file, metadata)
+    os.replace(tmp_meta_file, meta_file)
     
     print("\n✅ All files saved successfully!")
     print(f"   - Embeddings: {embeddings_file}")
@@ -251,8 +224,14 @@ def main():
     parser.add_argument(
         '--batch-size',
         type=int,
-        default=32,
-        help='Batch size for encoding (default: 32)'
+        default=None,
+        help='Batch size for encoding (default: 256 on GPU, 64 on CPU)'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help=f'Processes used to build mouse texts (default: 1; up to {os.cpu_count()} on this machine)'
     )
     parser.add_argument(
         '--force',
@@ -282,8 +261,7 @@ def main():
         print(f"   {meta_file}")
         
         # Load and show metadata
-        with open(meta_file, 'r') as f:
-            meta = json.load(f)
+        meta = read_json(meta_file)
         
         print(f"\nExisting embeddings:")
         print(f"   Model: {meta.get('model')}")
@@ -301,10 +279,10 @@ def main():
         df = load_dataset(dataset_path)
         
         # Generate embeddings
-        embeddings = generate_embeddings(df, args.model, args.batch_size)
+        embeddings, texts = generate_embeddings(df, args.model, args.batch_size, args.workers)
         
         # Save results
-        save_embeddings(embeddings, df, args.model, settings.DATA_DIR)
+        save_embeddings(embeddings, df, texts, args.model, settings.DATA_DIR, dataset_path)
         
         print("\n" + "=" * 60)
         print("✅ Embedding generation complete!")
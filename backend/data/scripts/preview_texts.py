@@ -5,7 +5,7 @@ Quick script to preview how mice are converted to text for embeddings.
 Useful for understanding and tuning the text generation.
 
 Usage:
-    python preview_texts.py [--count N]
+    python preview_texts.py [--count N] [--search NAME] [--rebuild]
 """
 
 import sys
@@ -18,9 +18,39 @@ import pandas as pd
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from app.core.config import settings
+from app.services.embeddings import dataset_fingerprint
 
-# Import the mouse_to_text function from generate_embeddings
-from generate_embeddings import mouse_to_text
+# The text builder shared by the backend and generate_embeddings
+from app.utils import mouse_text
+from app.utils.mouse_text import TEXT_COLUMNS, build_mouse_text
+from generate_embeddings import read_json
+
+
+def load_cached_texts(count: int):
+    """
+    Load the texts saved next to the embeddings, if they still match the data
+    
+    The cache is used only when the embeddings metadata names it (only
+    generate_embeddings.py writes it; the backend's meta file does not) and its
+    fingerprint matches the current dataset and text version, when it is newer
+    than the text builder, and when it holds one text per row; otherwise
+    returns None and the caller rebuilds the texts
+    """
+    meta_file = settings.DATA_DIR / "FINAL_EMBEDDINGS_meta.json"
+    texts_file = settings.DATA_DIR / "FINAL_EMBEDDINGS_texts.json"
+    try:
+        meta = read_json(meta_file)
+        cache_mtime = texts_file.stat().st_mtime
+    except (FileNotFoundError, ValueError):
+        return None
+    if meta.get('texts_file') != texts_file.name:
+        return None
+    if meta.get('fingerprint') != dataset_fingerprint(settings.DATASET_PATH, meta.get('model', '')):
+        return None
+    if cache_mtime < Path(mouse_text.__file__).stat().st_mtime:
+        return None
+    texts = read_json(texts_file)
+    return texts if isinstance(texts, list) and len(texts) == count else None
 
 
 def main():
@@ -38,12 +68,23 @@ def main():
         type=str,
         help='Search for specific mouse by name'
     )
+    parser.add_argument(
+        '--rebuild',
+        action='store_true',
+        help='Rebuild texts even if FINAL_EMBEDDINGS_texts.json is up to date'
+    )
     
     args = parser.parse_args()
     
     # Load dataset
     print(f"Loading dataset from: {settings.DATASET_PATH}")
-    df = pd.read_csv(settings.DATASET_PATH)
+    # Only parse the columns that go into the text
+    header = pd.read_csv(settings.DATASET_PATH, nrows=0).columns
+    df = pd.read_csv(
+        settings.DATASET_PATH,
+        engine='pyarrow',
+        usecols=[col for col in header if col in TEXT_COLUMNS]
+    )
     print(f"Loaded {len(df)} mice\n")
     
     if args.search:
@@ -61,13 +102,26 @@ def main():
         # Show first N mice
         df_display = df.head(args.count)
     
-    # Display text representations
-    for idx, row in df_display.iterrows():
-        mouse_dict = row.to_dict()
-        text = mouse_to_text(mouse_dict)
+    # Reuse the texts saved by the last embedding run when they are current
+    cached_texts = None if args.rebuild else load_cached_texts(len(df))
+    if cached_texts is not None:
+        print("Using cached texts from FINAL_EMBEDDINGS_texts.json\n")
+    
+    # Display text representations; rows are read as plain tuples against one
+    # column index map and not-null mask instead of a dict per row
+    col_idx = {col: i for i, col in enumerate(df_display.columns)}
+    name_idx = col_idx.get('Name')
+    present = df_display.notna().to_numpy()
+    rows = df_display.itertuples(index=False, name=None)
+    for idx, values, row_present in zip(df_display.index, rows, present):
+        # read_csv gives a RangeIndex, so the label is the row's position
+        if cached_texts is not None:
+            text = cached_texts[idx]
+        else:
+            text = build_mouse_text(values, row_present, col_idx)
         
         print("=" * 80)
-        print(f"Mouse #{idx + 1}: {mouse_dict.get('Name', 'Unknown')}")
+        print(f"Mouse #{idx + 1}: {values[name_idx] if name_idx is not None else 'Unknown'}")
         print("=" * 80)
         print(f"\n{text}\n")
         print(f"Character count: {len(text)}")
@@ -3,13 +3,17 @@ Price scraper using ScraperAPI to avoid getting blocked.
 """
 import os
 import csv
-import requests
+import asyncio
+import httpx
+import pandas as pd
 from pathlib import Path
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 from urllib.parse import urlencode, quote_plus
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
-import time
+from scraper_common import (
+    RETRY_STATUSES, MAX_RETRIES, DEFAULT_RATE, RateLimiter, ResponseCache, OrderedCSVWriter,
+    make_http_client, retry_delay, first_amazon_result, read_finished_names, group_by_model,
+)
 
 # Paths
 PROJECT_ROOT = Path(__file__).parent.parent.parent.parent
@@ -25,18 +29,33 @@ OUTPUT_CSV = DATA_DIR / "filtered_data_with_prices.csv"
 SCRAPERAPI_KEY = os.getenv('SCRAPERAPI_KEY')
 SCRAPERAPI_BASE_URL = 'http://api.scraperapi.com/'
 
+# Fetched pages are kept on disk for a week; --refresh re-fetches them
+PRICE_CACHE_FILE = DATA_DIR / "cache" / "price_cache.sqlite"
+
+# Requests in flight at once (ScraperAPI's entry plans allow 5 concurrent threads)
+DEFAULT_CONCURRENCY = 5
+
 
 class ScraperAPIClient:
     """Client for ScraperAPI."""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, http: httpx.AsyncClient, cache: Optional[ResponseCache] = None,
+                 limiter: Optional[RateLimiter] = None):
         if not api_key:
             raise ValueError("SCRAPERAPI_KEY not found in environment variables")
         
         self.api_key = api_key
         self.base_url = SCRAPERAPI_BASE_URL
+        self.http = http
+        self.cache = cache
+        self.limiter = limiter
+    
+    async def _send(self, params: Dict) -> httpx.Response:
+        if self.limiter is not None:
+            await self.limiter.acquire()
+        return await self.http.get(self.base_url, params=params)
     
-    def get(self, url: str, render_js: bool = False, country: str = 'us') -> Optional[str]:
+    async def get(self, url: str, render_js: bool = False, country: str = 'us') -> Optional[str]:
         """
         Fetch a URL through ScraperAPI.
         
@@ -57,18 +76,33 @@ class ScraperAPIClient:
         if render_js:
             params['render'] = 'true'
         
+        cache_key = f"{country}|{int(render_js)}|{url}"
+        if self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
         try:
             print(f"    [ScraperAPI] Fetching: {url}")
-            response = requests.get(self.base_url, params=params, timeout=60)
+            response = await self._send(params)
+            for attempt in range(MAX_RETRIES):
+                if response.status_code not in RETRY_STATUSES:
+                    break
+                if response.status_code == 429 and self.limiter is not None:
+                    self.limiter.slow_down()
+                await asyncio.sleep(retry_delay(response, attempt))
+                response = await self._send(params)
             response.raise_for_status()
             
             # Check ScraperAPI credits
             credits_used = response.headers.get('scraperapi-credits-used', 'unknown')
             print(f"    [ScraperAPI] Credits used: {credits_used}")
             
+            if self.cache is not None:
+                self.cache.set(cache_key, response.text)
             return response.text
         
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             print(f"    [ERROR] ScraperAPI request failed: {e}")
             return None
 
@@ -80,7 +114,7 @@ class AmazonPriceScraper:
         self.client = scraper_client
         self.base_url = "https://www.amazon.com"
     
-    def search_product(self, brand: str, model: str, name: str) -> Optional[Dict]:
+    async def search_product(self, brand: str, model: str, name: str) -> Optional[Dict]:
         """
         Search for a product and get its price.
         
@@ -99,35 +133,25 @@ class AmazonPriceScraper:
         print(f"  Searching: {query}")
         
         # Fetch search results
-        html = self.client.get(search_url)
+        html = await self.client.get(search_url)
         if not html:
             return None
         
-        # Parse HTML
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        # Find first product
-        products = soup.select('[data-component-type="s-search-result"]')
+        # Parse HTML off the event loop so other mice's requests keep moving
+        product = await asyncio.to_thread(first_amazon_result, html)
         
-        if not products:
+        if not product:
             print(f"    [WARN] No products found")
             return None
         
-        # Get first product details
-        first_product = products[0]
-        
-        # Extract title
-        title_elem = first_product.select_one('h2 a')
-        title = title_elem.get_text(strip=True) if title_elem else ""
+        title = product['title']
         
         # Extract price
-        price_elem = first_product.select_one('.a-price .a-offscreen')
-        if not price_elem:
+        price_text = product['price_text']
+        if not price_text:
             print(f"    [WARN] No price found")
             return None
         
-        price_text = price_elem.get_text(strip=True)
-        
         # Parse price
         try:
             # Remove currency symbols and parse
@@ -137,7 +161,7 @@ class AmazonPriceScraper:
             return None
         
         # Extract product URL
-        product_url = title_elem.get('href', '') if title_elem else ''
+        product_url = product['url']
         if product_url.startswith('/'):
             product_url = f"{self.base_url}{product_url}"
         
@@ -157,14 +181,26 @@ class AmazonPriceScraper:
         return result
 
 
-def scrape_prices(input_csv: Path, output_csv: Path, limit: Optional[int] = None):
+async def scrape_prices(input_csv: Path, output_csv: Path, limit: Optional[int] = None,
+                        concurrency: int = DEFAULT_CONCURRENCY, refresh: bool = False,
+                        resume: bool = False, parquet: bool = False, rate: float = DEFAULT_RATE):
     """
     Scrape prices for mice in CSV.
     
+    Mice are fetched concurrently over one pooled HTTP client; the semaphore
+    caps how many ScraperAPI requests are in flight instead of sleeping
+    between mice. Rows are streamed to the output in input order as they finish;
+    rows sharing a brand and model are searched once.
+    
     Args:
         input_csv: Input CSV path
         output_csv: Output CSV path
         limit: Limit number of mice to process
+        concurrency: Maximum mice scraped at once
+        refresh: Re-fetch pages even if they are in the response cache
+        resume: Keep the rows already in output_csv and only scrape the rest
+        parquet: Also save the finished output as a zstd-compressed Parquet file
+        rate: Average ScraperAPI requests per second (lowered automatically on 429s)
     """
     # Check for API key
     if not SCRAPERAPI_KEY:
@@ -182,14 +218,11 @@ def scrape_prices(input_csv: Path, output_csv: Path, limit: Optional[int] = None
     print("="*70)
     print()
     
-    # Initialize scraper
-    client = ScraperAPIClient(SCRAPERAPI_KEY)
-    amazon_scraper = AmazonPriceScraper(client)
-    
     # Read CSV
     with open(input_csv, 'r', encoding='utf-8') as f:
         reader = csv.DictReader(f)
         mice = list(reader)
+        input_fieldnames = list(reader.fieldnames or [])
     
     print(f"Total mice: {len(mice)}")
     if limit:
@@ -198,57 +231,86 @@ def scrape_prices(input_csv: Path, output_csv: Path, limit: Optional[int] = None
     print()
     
     # Add price columns if not present
-    fieldnames = list(mice[0].keys())
+    fieldnames = input_fieldnames
     price_fields = ['Price', 'Price_Currency', 'Price_URL', 'Price_Confidence', 'Price_Title']
     for field in price_fields:
         if field not in fieldnames:
             fieldnames.append(field)
     
     # Process each mouse
-    results = []
-    success_count = 0
-    
-    for i, mouse in enumerate(mice, 1):
+    async def process_mouse(i: int, indices: List[int], sem: asyncio.Semaphore) -> int:
+        mouse = mice[indices[0]]
         brand = mouse.get('Brand', '')
         model = mouse.get('Model', '')
         name = mouse.get('Name', '')
         
-        print(f"[{i}/{len(mice)}] {name}")
-        
-        # Try to scrape price
-        price_info = amazon_scraper.search_product(brand, model, name)
+        async with sem:
+            print(f"[{i}/{len(groups)}] {name}")
+            
+            # Try to scrape price
+            price_info = await amazon_scraper.search_product(brand, model, name)
         
         if price_info:
-            mouse['Price'] = price_info['price']
-            mouse['Price_Currency'] = price_info['currency']
-            mouse['Price_URL'] = price_info['url']
-            mouse['Price_Confidence'] = price_info['confidence']
-            mouse['Price_Title'] = price_info['title']
-            success_count += 1
+            prices = {
+                'Price': price_info['price'],
+                'Price_Currency': price_info['currency'],
+                'Price_URL': price_info['url'],
+                'Price_Confidence': price_info['confidence'],
+                'Price_Title': price_info['title'],
+            }
         else:
-            mouse['Price'] = ''
-            mouse['Price_Currency'] = ''
-            mouse['Price_URL'] = ''
-            mouse['Price_Confidence'] = ''
-            mouse['Price_Title'] = ''
+            prices = dict.fromkeys(price_fields, '')
         
-        results.append(mouse)
-        
-        # Rate limiting (be nice to ScraperAPI)
-        if i < len(mice):
-            print(f"  [Waiting 2s...]\n")
-            time.sleep(2)
+        # Fan the result out to every row of this model
+        for index in indices:
+            mice[index].update(prices)
+            writer.submit(index, mice[index])
+        return len(indices) if price_info else 0
     
-    # Write output
-    print("\n" + "="*70)
-    print(f"Writing results to: {output_csv}")
+    # Skip mice an interrupted run already wrote
+    try:
+        finished = read_finished_names(output_csv, fieldnames) if resume else None
+    except ValueError as e:
+        print(f"[ERROR] Cannot resume: {e}")
+        return
+    if finished is not None:
+        mice = [mouse for mouse in mice if mouse.get('Name', '') not in finished]
+        print(f"Resuming: {len(finished)} mice already in output, {len(mice)} left\n")
+        if not mice:
+            return
+    
+    # Rows of the same model (e.g. colorways) are scraped once, in first-seen order
+    groups = group_by_model(mice)
+    if len(groups) < len(mice):
+        print(f"Unique models: {len(groups)} ({len(mice) - len(groups)} duplicate rows reuse their price)\n")
     
-    with open(output_csv, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(results)
+    # Rate limiting (be nice to ScraperAPI) is the semaphore's cap on requests in flight
+    sem = asyncio.BoundedSemaphore(concurrency)
+    cache = ResponseCache(PRICE_CACHE_FILE, refresh=refresh)
+    limiter = RateLimiter(rate, burst=concurrency)
+    print(f"Writing results to: {output_csv}\n")
+    with open(output_csv, 'a' if finished is not None else 'w', encoding='utf-8', newline='') as f:
+        writer = OrderedCSVWriter(f, fieldnames)
+        if finished is None:
+            writer.writeheader()
+        async with make_http_client() as http:
+            amazon_scraper = AmazonPriceScraper(ScraperAPIClient(SCRAPERAPI_KEY, http, cache, limiter))
+            found = await asyncio.gather(*[
+                process_mouse(i, indices, sem) for i, indices in enumerate(groups.values(), 1)
+            ])
+    cache.close()
+    success_count = sum(found)
     
+    print("\n" + "="*70)
     print(f"Done! {success_count}/{len(mice)} prices found ({success_count/len(mice)*100:.1f}%)")
+    
+    if parquet:
+        # Columnar copy of the whole output (including rows kept by --resume)
+        parquet_path = output_csv.with_suffix('.parquet')
+        pd.read_csv(output_csv, engine='pyarrow').to_parquet(
+            parquet_path, engine='pyarrow', compression='zstd'
+        )
+        print(f"Saved Parquet copy to: {parquet_path}")
     print("="*70)
 
 
@@ -259,6 +321,16 @@ def main():
     parser.add_argument('--input', type=str, help='Input CSV path')
     parser.add_argument('--output', type=str, help='Output CSV path')
     parser.add_argument('--limit', type=int, help='Limit number to process')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'Mice scraped at once (default: {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--refresh', action='store_true',
+                        help='Re-fetch pages instead of reusing cached responses')
+    parser.add_argument('--resume', action='store_true',
+                        help='Keep mice already in the output CSV and scrape only the rest')
+    parser.add_argument('--parquet', action='store_true',
+                        help='Also write the output as a zstd-compressed Parquet file')
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                        help=f'ScraperAPI requests per second (default: {DEFAULT_RATE})')
     
     args = parser.parse_args()
     
@@ -269,7 +341,11 @@ def main():
         print(f"[ERROR] Input file not found: {input_path}")
         return 1
     
-    scrape_prices(input_path, output_path, args.limit)
+    asyncio.run(scrape_prices(
+        input_path, output_path, args.limit,
+        concurrency=args.concurrency, refresh=args.refresh, resume=args.resume, parquet=args.parquet,
+        rate=args.rate
+    ))
     return 0
 
 
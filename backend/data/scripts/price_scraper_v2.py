@@ -3,14 +3,19 @@ Enhanced price scraper with multiple sources prioritizing official sites.
 """
 import os
 import csv
-import requests
+import asyncio
+import httpx
+import pandas as pd
 from pathlib import Path
-from typing import Optional, Dict, List
+from typing import Callable, Optional, Dict, List, Tuple
 from urllib.parse import quote_plus
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from dotenv import load_dotenv
-import time
 import re
+from scraper_common import (
+    RETRY_STATUSES, MAX_RETRIES, DEFAULT_RATE, RateLimiter, ResponseCache, OrderedCSVWriter,
+    make_http_client, retry_delay, first_amazon_result, read_finished_names, group_by_model,
+)
 
 # Paths
 PROJECT_ROOT = Path(__file__).parent.parent.parent.parent
@@ -25,6 +30,12 @@ OUTPUT_CSV = DATA_DIR / "filtered_data_with_prices.csv"
 SCRAPERAPI_KEY = os.getenv('SCRAPERAPI_KEY')
 SCRAPERAPI_BASE_URL = 'http://api.scraperapi.com/'
 
+# Fetched pages are kept on disk for a week; --refresh re-fetches them
+PRICE_CACHE_FILE = DATA_DIR / "cache" / "price_cache.sqlite"
+
+# Mice scraped at once (ScraperAPI's entry plans allow 5 concurrent threads)
+DEFAULT_CONCURRENCY = 5
+
 # Brand official websites and pricing patterns
 BRAND_SITES = {
     'Logitech': {'domain': 'logitech.com', 'priority': 1},
@@ -46,18 +57,56 @@ BRAND_SITES = {
     'Keychron': {'domain': 'keychron.com', 'priority': 1},
 }
 
+# Case-insensitive view of BRAND_SITES, longest name first so substring matches
+# prefer the most specific brand
+BRAND_LOOKUP = dict(sorted(((b.lower(), site) for b, site in BRAND_SITES.items()),
+                           key=lambda item: -len(item[0])))
+
+
+def find_brand_site(brand: str) -> Optional[Dict]:
+    """Look up a brand's site, tolerating case and variants like 'Logitech G'."""
+    brand = brand.lower().strip()
+    if brand in BRAND_LOOKUP:
+        return BRAND_LOOKUP[brand]
+    return next((site for name, site in BRAND_LOOKUP.items() if name in brand), None)
+
+# Pattern for prices: $XX.XX or XX.XX USD or €XX.XX, preferred in this order
+PRICE_PATTERNS = (
+    r'\$(\d{1,4}(?:,\d{3})*(?:\.\d{2})?)',  # $99.99
+    r'(\d{1,4}(?:,\d{3})*(?:\.\d{2})?)\s*USD',  # 99.99 USD
+    r'€(\d{1,4}(?:,\d{3})*(?:\.\d{2})?)',  # €99.99
+    r'£(\d{1,4}(?:,\d{3})*(?:\.\d{2})?)',  # £99.99
+)
+# All patterns in one alternation; each has one group, so match.lastindex - 1
+# is the index of the pattern that matched
+PRICE_RE = re.compile('|'.join(PRICE_PATTERNS))
+
+# Parse only the nodes each page is searched for, with the C-backed lxml parser.
+# Parsing and price scans run in worker threads (asyncio.to_thread) so a large
+# page does not stall the event loop while other mice's requests are in flight
+LINKS = SoupStrainer('a', href=True)
+
 
 class ScraperAPIClient:
     """Client for ScraperAPI."""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, http: httpx.AsyncClient, cache: Optional[ResponseCache] = None,
+                 limiter: Optional[RateLimiter] = None):
         if not api_key:
             raise ValueError("SCRAPERAPI_KEY not found in environment variables")
         
         self.api_key = api_key
         self.base_url = SCRAPERAPI_BASE_URL
+        self.http = http
+        self.cache = cache
+        self.limiter = limiter
+    
+    async def _send(self, params: Dict) -> httpx.Response:
+        if self.limiter is not None:
+            await self.limiter.acquire()
+        return await self.http.get(self.base_url, params=params)
     
-    def get(self, url: str, render_js: bool = False, country: str = 'us') -> Optional[str]:
+    async def get(self, url: str, render_js: bool = False, country: str = 'us') -> Optional[str]:
         """Fetch a URL through ScraperAPI."""
         params = {
             'api_key': self.api_key,
@@ -68,17 +117,32 @@ class ScraperAPIClient:
         if render_js:
             params['render'] = 'true'
         
+        cache_key = f"{country}|{int(render_js)}|{url}"
+        if self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
         try:
             print(f"      Fetching: {url[:60]}...")
-            response = requests.get(self.base_url, params=params, timeout=60)
+            response = await self._send(params)
+            for attempt in range(MAX_RETRIES):
+                if response.status_code not in RETRY_STATUSES:
+                    break
+                if response.status_code == 429 and self.limiter is not None:
+                    self.limiter.slow_down()
+                await asyncio.sleep(retry_delay(response, attempt))
+                response = await self._send(params)
             response.raise_for_status()
             
             credits_used = response.headers.get('scraperapi-credits-used', '?')
             print(f"      Credits used: {credits_used}")
             
+            if self.cache is not None:
+                self.cache.set(cache_key, response.text)
             return response.text
         
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             print(f"      ERROR: {e}")
             return None
 
@@ -86,50 +150,48 @@ class ScraperAPIClient:
 class PriceScraper:
     """Multi-source price scraper."""
     
-    def __init__(self, scraper_client: ScraperAPIClient):
+    def __init__(self, scraper_client: ScraperAPIClient, parallel_sources: bool = False):
         self.client = scraper_client
+        self.parallel_sources = parallel_sources
     
     def extract_price_from_text(self, text: str) -> Optional[float]:
         """Extract price from text using regex."""
-        # Pattern for prices: $XX.XX or XX.XX USD or €XX.XX
-        patterns = [
-            r'\$(\d{1,4}(?:,\d{3})*(?:\.\d{2})?)',  # $99.99
-            r'(\d{1,4}(?:,\d{3})*(?:\.\d{2})?)\s*USD',  # 99.99 USD
-            r'€(\d{1,4}(?:,\d{3})*(?:\.\d{2})?)',  # €99.99
-            r'£(\d{1,4}(?:,\d{3})*(?:\.\d{2})?)',  # £99.99
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, text)
-            for match in matches:
-                try:
-                    price = float(match.replace(',', ''))
-                    # Sanity check: mice typically $20-500
-                    if 20 <= price <= 500:
-                        return price
-                except ValueError:
-                    continue
-        
-        return None
+        # One pass over the page; the first plausible price of the most preferred
+        # pattern wins, so a $ price returns immediately
+        best_price = None
+        best_rank = len(PRICE_PATTERNS)
+        for match in PRICE_RE.finditer(text):
+            rank = match.lastindex - 1
+            if rank >= best_rank:
+                continue
+            price = float(match.group(match.lastindex).replace(',', ''))
+            # Sanity check: mice typically $20-500
+            if 20 <= price <= 500:
+                if rank == 0:
+                    return price
+                best_price, best_rank = price, rank
+        
+        return best_price
     
-    def search_brand_site(self, brand: str, model: str, name: str) -> Optional[Dict]:
+    async def search_brand_site(self, brand: str, model: str, name: str) -> Optional[Dict]:
         """Search official brand website."""
-        if brand not in BRAND_SITES:
+        site = find_brand_site(brand)
+        if site is None:
             return None
         
-        domain = BRAND_SITES[brand]['domain']
+        domain = site['domain']
         
         # Try direct Google search for product on brand site
         query = f"site:{domain} {model}"
         search_url = f"https://www.google.com/search?q={quote_plus(query)}"
         
         print(f"    [Brand Site] {domain} - {model}")
-        html = self.client.get(search_url)
+        html = await self.client.get(search_url)
         
         if not html:
             return None
         
-        soup = BeautifulSoup(html, 'html.parser')
+        soup = await asyncio.to_thread(BeautifulSoup, html, 'lxml', parse_only=LINKS)
         
         # Find first organic result link
         links = soup.find_all('a', href=True)
@@ -147,13 +209,13 @@ class PriceScraper:
         
         # Fetch product page
         print(f"      Found product page: {product_url[:60]}...")
-        product_html = self.client.get(product_url, render_js=True)
+        product_html = await self.client.get(product_url, render_js=True)
         
         if not product_html:
             return None
         
         # Extract price from product page
-        price = self.extract_price_from_text(product_html)
+        price = await asyncio.to_thread(self.extract_price_from_text, product_html)
         
         if price:
             return {
@@ -165,39 +227,31 @@ class PriceScraper:
         
         return None
     
-    def search_amazon(self, brand: str, model: str, name: str) -> Optional[Dict]:
+    async def search_amazon(self, brand: str, model: str, name: str) -> Optional[Dict]:
         """Search Amazon for product."""
         query = f"{brand} {model} gaming mouse"
         search_url = f"https://www.amazon.com/s?k={quote_plus(query)}&i=electronics"
         
         print(f"    [Amazon US] {query}")
-        html = self.client.get(search_url)
+        html = await self.client.get(search_url)
         
         if not html:
             return None
         
-        soup = BeautifulSoup(html, 'html.parser')
-        products = soup.select('[data-component-type="s-search-result"]')
-        
-        if not products:
-            return None
-        
-        first_product = products[0]
-        title_elem = first_product.select_one('h2 a')
-        title = title_elem.get_text(strip=True) if title_elem else ""
+        product = await asyncio.to_thread(first_amazon_result, html)
         
-        price_elem = first_product.select_one('.a-price .a-offscreen')
-        if not price_elem:
+        if not product or not product['price_text']:
             return None
         
-        price_text = price_elem.get_text(strip=True)
+        title = product['title']
+        price_text = product['price_text']
         
         try:
             price_value = float(price_text.replace('$', '').replace(',', ''))
         except ValueError:
             return None
         
-        product_url = title_elem.get('href', '') if title_elem else ''
+        product_url = product['url']
         if product_url.startswith('/'):
             product_url = f"https://www.amazon.com{product_url}"
         
@@ -216,18 +270,18 @@ class PriceScraper:
             'title': title
         }
     
-    def search_aliexpress(self, brand: str, model: str, name: str) -> Optional[Dict]:
+    async def search_aliexpress(self, brand: str, model: str, name: str) -> Optional[Dict]:
         """Search AliExpress (good for Chinese brands)."""
         query = f"{brand} {model} mouse"
         search_url = f"https://www.aliexpress.com/wholesale?SearchText={quote_plus(query)}"
         
         print(f"    [AliExpress] {query}")
-        html = self.client.get(search_url, render_js=True)
+        html = await self.client.get(search_url, render_js=True)
         
         if not html:
             return None
         
-        price = self.extract_price_from_text(html)
+        price = await asyncio.to_thread(self.extract_price_from_text, html)
         
         if price:
             # AliExpress prices are typically wholesale, add markup estimate
@@ -241,41 +295,104 @@ class PriceScraper:
         
         return None
     
-    def search_all_sources(self, brand: str, model: str, name: str) -> Optional[Dict]:
-        """Search all sources in priority order."""
+    async def search_all_sources(self, brand: str, model: str, name: str) -> Optional[Dict]:
+        """
+        Search all sources in priority order.
+        
+        A source is only queried when every source before it missed or came back
+        with low confidence, so a confident official price costs no Amazon or
+        AliExpress credits. Concurrency comes from scraping several mice at once.
+        With parallel_sources, see _search_sources_parallel instead.
+        """
         sources = [
             ('Official Site', lambda: self.search_brand_site(brand, model, name)),
             ('Amazon', lambda: self.search_amazon(brand, model, name)),
             ('AliExpress', lambda: self.search_aliexpress(brand, model, name)),
         ]
         
+        if self.parallel_sources:
+            return await self._search_sources_parallel(sources)
+        
         best_result = None
         best_confidence = 0
         
         for source_name, search_func in sources:
             try:
-                result = search_func()
-                if result and result['confidence'] > best_confidence:
-                    best_result = result
-                    best_confidence = result['confidence']
-                    
-                    # If we have high confidence from official site, stop
-                    if best_confidence >= 0.9:
-                        print(f"      ✓ High confidence result from {source_name}")
-                        break
-                
+                result = await search_func()
             except Exception as e:
                 print(f"      ERROR in {source_name}: {e}")
                 continue
             
-            # Rate limiting between sources
-            time.sleep(1)
+            if result and result['confidence'] > best_confidence:
+                best_result = result
+                best_confidence = result['confidence']
+                
+                # If we have high confidence from official site, stop
+                if best_confidence >= 0.9:
+                    print(f"      ✓ High confidence result from {source_name}")
+                    break
         
         return best_result
+    
+    async def _search_sources_parallel(self, sources: List[Tuple[str, Callable]]) -> Optional[Dict]:
+        """
+        Query every source at once and return as soon as the answer is settled
+        
+        Opt-in (--parallel-sources): a mouse's price arrives after its slowest
+        needed lookup rather than the sum of them, but every source's request is
+        sent and billed up front, so cancelling the losers saves time, not
+        credits. The result matches the sequential search: a high-confidence
+        result wins once every higher-priority source has finished
+        """
+        async def run(source_name: str, search_func: Callable) -> Optional[Dict]:
+            try:
+                return await search_func()
+            except Exception as e:
+                print(f"      ERROR in {source_name}: {e}")
+                return None
+        
+        tasks = [asyncio.create_task(run(source_name, search_func)) for source_name, search_func in sources]
+        results: Dict[int, Optional[Dict]] = {}
+        
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    results[tasks.index(task)] = task.result()
+                
+                # Walk the finished prefix in priority order, as the sequential loop would
+                best_result = None
+                best_confidence = 0
+                for rank in range(len(tasks)):
+                    if rank not in results:
+                        break
+                    result = results[rank]
+                    if result and result['confidence'] > best_confidence:
+                        best_result = result
+                        best_confidence = result['confidence']
+                        if best_confidence >= 0.9:
+                            print(f"      ✓ High confidence result from {sources[rank][0]}")
+                            return best_result
+            return best_result
+        finally:
+            for task in tasks:
+                task.cancel()
 
-
-def scrape_prices(input_csv: Path, output_csv: Path, limit: Optional[int] = None):
-    """Scrape prices for mice in CSV."""
+async def scrape_prices(input_csv: Path, output_csv: Path, limit: Optional[int] = None,
+                        concurrency: int = DEFAULT_CONCURRENCY, refresh: bool = False,
+                        resume: bool = False, parquet: bool = False, rate: float = DEFAULT_RATE,
+                        parallel_sources: bool = False):
+    """
+    Scrape prices for mice in CSV.
+    
+    Up to `concurrency` mice are searched at once over one pooled HTTP client,
+    instead of one at a time with a sleep in between. Rows are streamed to the
+    output in input order as they finish; with resume, mice already in the
+    output are skipped. Rows sharing a brand and model are searched once.
+    With parallel_sources, each mouse queries all sources at once (faster, but
+    pays for every source's request).
+    """
     if not SCRAPERAPI_KEY:
         print("[ERROR] SCRAPERAPI_KEY not found in environment variables")
         return
@@ -288,12 +405,10 @@ def scrape_prices(input_csv: Path, output_csv: Path, limit: Optional[int] = None
     print("="*70)
     print()
     
-    client = ScraperAPIClient(SCRAPERAPI_KEY)
-    scraper = PriceScraper(client)
-    
     with open(input_csv, 'r', encoding='utf-8') as f:
         reader = csv.DictReader(f)
         mice = list(reader)
+        input_fieldnames = list(reader.fieldnames or [])
     
     print(f"Total mice: {len(mice)}")
     if limit:
@@ -301,57 +416,87 @@ def scrape_prices(input_csv: Path, output_csv: Path, limit: Optional[int] = None
         print(f"Processing: {limit} mice")
     print()
     
-    fieldnames = list(mice[0].keys())
+    fieldnames = input_fieldnames
     price_fields = ['Price', 'Price_Source', 'Price_Confidence', 'Price_URL', 'Price_Title']
     for field in price_fields:
         if field not in fieldnames:
             fieldnames.append(field)
     
-    results = []
-    success_count = 0
-    
-    for i, mouse in enumerate(mice, 1):
+    async def process_mouse(i: int, indices: List[int], sem: asyncio.Semaphore) -> int:
+        mouse = mice[indices[0]]
         brand = mouse.get('Brand', '')
         model = mouse.get('Model', '')
         name = mouse.get('Name', '')
         
-        print(f"\n[{i}/{len(mice)}] {name}")
-        print(f"  Brand: {brand} | Model: {model}")
-        
-        price_info = scraper.search_all_sources(brand, model, name)
+        async with sem:
+            print(f"\n[{i}/{len(groups)}] {name}")
+            print(f"  Brand: {brand} | Model: {model}")
+            
+            price_info = await scraper.search_all_sources(brand, model, name)
         
         if price_info:
-            mouse['Price'] = price_info['price']
-            mouse['Price_Source'] = price_info['source']
-            mouse['Price_Confidence'] = price_info['confidence']
-            mouse['Price_URL'] = price_info.get('url', '')
-            mouse['Price_Title'] = price_info.get('title', '')
-            success_count += 1
-            print(f"  ✓ FOUND: ${price_info['price']:.2f} from {price_info['source']} (confidence: {price_info['confidence']:.2f})")
+            prices = {
+                'Price': price_info['price'],
+                'Price_Source': price_info['source'],
+                'Price_Confidence': price_info['confidence'],
+                'Price_URL': price_info.get('url', ''),
+                'Price_Title': price_info.get('title', ''),
+            }
+            print(f"  ✓ FOUND {name}: ${price_info['price']:.2f} from {price_info['source']} (confidence: {price_info['confidence']:.2f})")
         else:
-            mouse['Price'] = ''
-            mouse['Price_Source'] = ''
-            mouse['Price_Confidence'] = ''
-            mouse['Price_URL'] = ''
-            mouse['Price_Title'] = ''
-            print(f"  ✗ NOT FOUND")
-        
-        results.append(mouse)
-        
-        # Rate limiting between products
-        if i < len(mice):
-            print(f"  [Waiting 3s...]")
-            time.sleep(3)
+            prices = dict.fromkeys(price_fields, '')
+            print(f"  ✗ NOT FOUND: {name}")
+        
+        # Fan the result out to every row of this model
+        for index in indices:
+            mice[index].update(prices)
+            writer.submit(index, mice[index])
+        return len(indices) if price_info else 0
     
-    print("\n" + "="*70)
-    print(f"Writing results to: {output_csv}")
+    # Skip mice an interrupted run already wrote
+    try:
+        finished = read_finished_names(output_csv, fieldnames) if resume else None
+    except ValueError as e:
+        print(f"[ERROR] Cannot resume: {e}")
+        return
+    if finished is not None:
+        mice = [mouse for mouse in mice if mouse.get('Name', '') not in finished]
+        print(f"Resuming: {len(finished)} mice already in output, {len(mice)} left\n")
+        if not mice:
+            return
+    
+    # Rows of the same model (e.g. colorways) are scraped once, in first-seen order
+    groups = group_by_model(mice)
+    if len(groups) < len(mice):
+        print(f"Unique models: {len(groups)} ({len(mice) - len(groups)} duplicate rows reuse their price)\n")
     
-    with open(output_csv, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(results)
+    # Rate limiting between products is the semaphore's cap on mice in flight
+    sem = asyncio.BoundedSemaphore(concurrency)
+    cache = ResponseCache(PRICE_CACHE_FILE, refresh=refresh)
+    limiter = RateLimiter(rate, burst=concurrency)
+    print(f"Writing results to: {output_csv}\n")
+    with open(output_csv, 'a' if finished is not None else 'w', encoding='utf-8', newline='') as f:
+        writer = OrderedCSVWriter(f, fieldnames)
+        if finished is None:
+            writer.writeheader()
+        async with make_http_client() as http:
+            scraper = PriceScraper(ScraperAPIClient(SCRAPERAPI_KEY, http, cache, limiter), parallel_sources)
+            found = await asyncio.gather(*[
+                process_mouse(i, indices, sem) for i, indices in enumerate(groups.values(), 1)
+            ])
+    cache.close()
+    success_count = sum(found)
     
+    print("\n" + "="*70)
     print(f"Done! {success_count}/{len(mice)} prices found ({success_count/len(mice)*100:.1f}%)")
+    
+    if parquet:
+        # Columnar copy of the whole output (including rows kept by --resume)
+        parquet_path = output_csv.with_suffix('.parquet')
+        pd.read_csv(output_csv, engine='pyarrow').to_parquet(
+            parquet_path, engine='pyarrow', compression='zstd'
+        )
+        print(f"Saved Parquet copy to: {parquet_path}")
     print("="*70)
 
 
@@ -360,13 +505,29 @@ def main():
     
     parser = argparse.ArgumentParser(description='Multi-source price scraper')
     parser.add_argument('--limit', type=int, help='Limit number to process')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'Mice scraped at once (default: {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--refresh', action='store_true',
+                        help='Re-fetch pages instead of reusing cached responses')
+    parser.add_argument('--resume', action='store_true',
+                        help='Keep mice already in the output CSV and scrape only the rest')
+    parser.add_argument('--parquet', action='store_true',
+                        help='Also write the output as a zstd-compressed Parquet file')
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                        help=f'ScraperAPI requests per second (default: {DEFAULT_RATE})')
+    parser.add_argument('--parallel-sources', action='store_true',
+                        help='Query all price sources at once per mouse (faster, uses more credits)')
     args = parser.parse_args()
     
     if not INPUT_CSV.exists():
         print(f"[ERROR] Input file not found: {INPUT_CSV}")
         return 1
     
-    scrape_prices(INPUT_CSV, OUTPUT_CSV, args.limit)
+    asyncio.run(scrape_prices(
+        INPUT_CSV, OUTPUT_CSV, args.limit,
+        concurrency=args.concurrency, refresh=args.refresh, resume=args.resume, parquet=args.parquet,
+        rate=args.rate, parallel_sources=args.parallel_sources
+    ))
     return 0
 
 
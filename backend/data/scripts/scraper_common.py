@@ -0,0 +1,212 @@
+"""
+Shared plumbing for the ScraperAPI price scrapers (price_scraper_v1.py and
+price_scraper_v2.py): the pooled HTTP client, rate limiting and retries, the
+response cache, Amazon result parsing and the ordered, resumable CSV output.
+"""
+import csv
+import time
+import sqlite3
+import asyncio
+import httpx
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple
+from lxml import etree, html as lxml_html
+
+# Cached pages are reused for a week (ResponseCache's default TTL)
+CACHE_TTL = 7 * 24 * 3600
+
+# Retry throttled / failed ScraperAPI responses with exponential backoff
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5  # seconds, doubled per attempt
+MAX_BACKOFF = 30
+
+# Requests per second sent to ScraperAPI; halved on each 429 down to MIN_RATE
+DEFAULT_RATE = 5.0
+MIN_RATE = 0.5
+
+
+def make_http_client() -> httpx.AsyncClient:
+    """One pooled keep-alive client shared by every request of a run"""
+    # The transport also retries failed connection attempts
+    transport = httpx.AsyncHTTPTransport(
+        retries=MAX_RETRIES,
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=85),
+    )
+    return httpx.AsyncClient(timeout=60, transport=transport)
+
+
+class RateLimiter:
+    """
+    Token bucket pacing ScraperAPI requests to `rate` per second on average
+    (bursts up to `burst`); slow_down() halves the rate after a 429
+    """
+    
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+    
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+    
+    def slow_down(self):
+        self.rate = max(self.rate / 2, MIN_RATE)
+
+
+def retry_delay(response: httpx.Response, attempt: int) -> float:
+    """Seconds to wait before retrying: the server's Retry-After if given, else exponential backoff"""
+    retry_after = response.headers.get('retry-after', '')
+    if retry_after.isdigit():
+        return min(float(retry_after), MAX_BACKOFF)
+    return min(RETRY_BACKOFF * 2 ** attempt, MAX_BACKOFF)
+
+
+class ResponseCache:
+    """
+    SQLite store of ScraperAPI responses keyed by request, so re-runs skip pages
+    fetched within the TTL (and spend no credits on them)
+    """
+    
+    def __init__(self, path: Path, ttl: float = CACHE_TTL, refresh: bool = False):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses '
+            '(key TEXT PRIMARY KEY, fetched_at REAL NOT NULL, body TEXT NOT NULL)'
+        )
+        self.ttl = ttl
+        # refresh: ignore stored pages, but still store the new ones
+        self.refresh = refresh
+    
+    def get(self, key: str) -> Optional[str]:
+        if self.refresh:
+            return None
+        row = self.conn.execute(
+            'SELECT body FROM responses WHERE key = ? AND fetched_at > ?',
+            (key, time.time() - self.ttl)
+        ).fetchone()
+        return row[0] if row else None
+    
+    def set(self, key: str, body: str):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO responses (key, fetched_at, body) VALUES (?, ?, ?)',
+            (key, time.time(), body)
+        )
+        self.conn.commit()
+    
+    def close(self):
+        self.conn.close()
+
+
+# Amazon result cards are read with precompiled XPath over lxml's tree (evaluated
+# in C): the first card, then its title link (CSS 'h2 a') and its displayed
+# price (CSS '.a-price .a-offscreen')
+FIRST_RESULT = etree.XPath('(//*[@data-component-type="s-search-result"])[1]')
+RESULT_TITLE = etree.XPath('(.//h2//a)[1]')
+RESULT_PRICE = etree.XPath(
+    '(.//*[contains(concat(" ", normalize-space(@class), " "), " a-price ")]'
+    '//*[contains(concat(" ", normalize-space(@class), " "), " a-offscreen ")])[1]'
+)
+
+
+def element_text(elem) -> str:
+    """Text of an element and its children, each piece stripped (like BeautifulSoup's get_text(strip=True))"""
+    return ''.join(text.strip() for text in elem.itertext())
+
+
+def first_amazon_result(html: str) -> Optional[Dict]:
+    """
+    Title, link and price text of the first Amazon search result
+    
+    Returns None if the page has no result card; 'price_text' is None if the
+    card shows no price
+    """
+    try:
+        root = lxml_html.fromstring(html)
+    except (etree.ParserError, ValueError):
+        return None
+    
+    cards = FIRST_RESULT(root)
+    if not cards:
+        return None
+    
+    titles = RESULT_TITLE(cards[0])
+    prices = RESULT_PRICE(cards[0])
+    return {
+        'title': element_text(titles[0]) if titles else '',
+        'url': titles[0].get('href', '') if titles else '',
+        'price_text': element_text(prices[0]) if prices else None,
+    }
+
+
+class OrderedCSVWriter:
+    """
+    Write rows to the output CSV as mice finish, in input order
+    
+    A row is held only until every earlier row has been written, and the file
+    is flushed after each write, so an interrupted run keeps its finished prefix
+    """
+    
+    def __init__(self, f, fieldnames: List[str]):
+        self.f = f
+        self.writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
+        self.pending = {}
+        self.next_index = 0
+    
+    def writeheader(self):
+        self.writer.writeheader()
+        self.f.flush()
+    
+    def submit(self, index: int, row: Dict):
+        self.pending[index] = row
+        if self.next_index not in self.pending:
+            return
+        while self.next_index in self.pending:
+            self.writer.writerow(self.pending.pop(self.next_index))
+            self.next_index += 1
+        self.f.flush()
+
+
+def read_finished_names(output_csv: Path, fieldnames: List[str]) -> Optional[set]:
+    """
+    Names already written to output_csv by an earlier run, or None if there is
+    nothing to resume (no file, or an empty one)
+    
+    Raises ValueError if the file has a different header (e.g. it was written by
+    the other scraper version): resuming must never truncate existing results
+    """
+    if not output_csv.exists() or output_csv.stat().st_size == 0:
+        return None
+    with open(output_csv, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames != fieldnames:
+            raise ValueError(
+                f"{output_csv} has columns {reader.fieldnames}, expected {fieldnames}; "
+                "move it aside or drop --resume to start over"
+            )
+        return {row.get('Name', '') for row in reader}
+
+
+def model_key(mouse: Dict) -> Tuple[str, str]:
+    """Brand and model, normalized; rows without a model fall back to their name"""
+    model = mouse.get('Model', '').lower().strip() or mouse.get('Name', '').lower().strip()
+    return mouse.get('Brand', '').lower().strip(), model
+
+
+def group_by_model(mice: List[Dict]) -> Dict[Tuple[str, str], List[int]]:
+    """Row indices of mice, grouped by model_key in first-seen order"""
+    groups = {}
+    for index, mouse in enumerate(mice):
+        groups.setdefault(model_key(mouse), []).append(index)
+    return groups
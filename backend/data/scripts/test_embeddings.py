@@ -9,7 +9,6 @@ Usage:
 """
 
 import sys
-import json
 from pathlib import Path
 
 import numpy as np
@@ -21,6 +20,9 @@ sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from app.core.config import settings
 
+# Reader for the JSON artifacts generate_embeddings.py writes
+from generate_embeddings import read_json
+
 
 def load_embeddings():
     """Load embeddings and metadata from data directory"""
@@ -34,32 +36,33 @@ def load_embeddings():
         )
     
     print(f"Loading embeddings from: {embeddings_file}")
-    embeddings = np.load(embeddings_file)
+    # Similarity math runs in float32; the float32 file stays memory-mapped (no
+    # copy), and a cache in any other dtype is upcast once here
+    embeddings = np.load(embeddings_file, mmap_mode='r', allow_pickle=False).astype(np.float32, copy=False)
     
     print(f"Loading metadata from: {meta_file}")
-    with open(meta_file, 'r') as f:
-        metadata = json.load(f)
+    metadata = read_json(meta_file)
     
     return embeddings, metadata
 
 
-def cosine_similarity(a, b):
-    """Compute cosine similarity between two vectors"""
-    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
-
-
-def find_similar_mice(query_embedding, embeddings, mouse_names, top_k=5):
-    """Find most similar mice to a query embedding"""
-    similarities = []
+def find_similar_mice(query_embedding, embeddings, mouse_names, top_k=5, normalized=False):
+    """
+    Find most similar mice to a query embedding
     
-    for i, emb in enumerate(embeddings):
-        sim = cosine_similarity(query_embedding, emb)
-        similarities.append((i, mouse_names[i], sim))
+    All mice are scored with one matrix-vector product; with normalized=True
+    (unit-length rows and query) that product is already the cosine similarity
+    """
+    scores = embeddings @ query_embedding
+    if not normalized:
+        scores = scores / (np.linalg.norm(embeddings, axis=1) * np.linalg.norm(query_embedding))
     
-    # Sort by similarity (descending)
-    similarities.sort(key=lambda x: x[2], reverse=True)
+    # Partition out the top K, then sort only those (descending)
+    top_k = min(top_k, len(scores))
+    top = np.argpartition(-scores, top_k - 1)[:top_k] if top_k < len(scores) else np.arange(len(scores))
+    top = top[np.argsort(-scores[top])]
     
-    return similarities[:top_k]
+    return [(int(i), mouse_names[i], float(scores[i])) for i in top]
 
 
 def test_basic_properties(embeddings, metadata):
@@ -69,6 +72,7 @@ def test_basic_properties(embeddings, metadata):
     print("=" * 60)
     
     print(f"\n✓ Shape: {embeddings.shape}")
+    print(f"✓ dtype: {embeddings.dtype} (saved as {metadata.get('dtype', 'unknown')})")
     print(f"✓ Number of mice: {metadata['count']}")
     print(f"✓ Embedding dimension: {metadata['dimension']}")
     print(f"✓ Model used: {metadata['model']}")
@@ -106,6 +110,9 @@ def test_similarity_search(embeddings, metadata):
         print("⚠️  No mouse names in metadata, skipping similarity test")
         return
     
+    # Mouse vectors saved with normalize_embeddings=True; queries are encoded the same way
+    normalized = metadata.get('normalized', False)
+    
     # Load the dataset to get prices
     df = pd.read_csv(settings.DATASET_PATH)
     
@@ -122,21 +129,23 @@ def test_similarity_search(embeddings, metadata):
         ("premium mouse under 100 dollars", None, 100),  # Budget filter!
     ]
     
-    for query_data in test_queries:
-        if isinstance(query_data, tuple):
-            query, budget_min, budget_max = query_data
-        else:
-            query = query_data
-            budget_min, budget_max = None, None
-        
+    # Plain strings are queries without a budget filter
+    test_queries = [q if isinstance(q, tuple) else (q, None, None) for q in test_queries]
+    
+    # Encode every query in one batched forward pass
+    query_embs = model.encode(
+        [query for query, _, _ in test_queries],
+        batch_size=32,
+        normalize_embeddings=True,
+        convert_to_numpy=True,
+    ).astype(np.float32, copy=False)
+    
+    for (query, budget_min, budget_max), query_emb in zip(test_queries, query_embs):
         print(f"\n🔍 Query: '{query}'")
         if budget_max:
             print(f"   Budget filter: ≤ ${budget_max}")
         print("-" * 60)
         
-        # Generate query embedding
-        query_emb = model.encode(query, normalize_embeddings=True)
-        
         # Apply budget filter if specified
         if budget_min is not None or budget_max is not None:
             valid_indices = []
@@ -161,10 +170,11 @@ def test_similarity_search(embeddings, metadata):
             print(f"  Filtered to {len(valid_indices)} mice within budget")
             
             # Find similar mice from filtered set
-            similar = find_similar_mice(query_emb, filtered_embeddings, filtered_names, top_k=3)
+            similar = find_similar_mice(query_emb, filtered_embeddings, filtered_names, top_k=3,
+                                        normalized=normalized)
         else:
             # No filter - search all mice
-            similar = find_similar_mice(query_emb, embeddings, mouse_names, top_k=3)
+            similar = find_similar_mice(query_emb, embeddings, mouse_names, top_k=3, normalized=normalized)
         
         print("Top 3 matches:")
         for rank, (idx, name, score) in enumerate(similar, 1):
@@ -195,7 +205,8 @@ def test_mouse_to_mouse_similarity(embeddings, metadata):
     print(f"\nReference mouse: {ref_name}")
     print("\nFinding most similar mice...")
     
-    similar = find_similar_mice(ref_emb, embeddings, mouse_names, top_k=6)
+    similar = find_similar_mice(ref_emb, embeddings, mouse_names, top_k=6,
+                                normalized=metadata.get('normalized', False))
     
     # Skip first result (self-similarity)
     print("\nTop 5 most similar:")
@@ -212,18 +223,14 @@ def test_diversity(embeddings):
     
     # Compute pairwise similarities (sample if too large)
     n_samples = min(100, len(embeddings))
-    sample_indices = np.random.choice(len(embeddings), n_samples, replace=False)
+    sample_indices = np.random.default_rng().choice(len(embeddings), n_samples, replace=False)
     sample_embs = embeddings[sample_indices]
     
     print(f"\nComputing pairwise similarities for {n_samples} mice...")
     
-    similarities = []
-    for i in range(len(sample_embs)):
-        for j in range(i + 1, len(sample_embs)):
-            sim = cosine_similarity(sample_embs[i], sample_embs[j])
-            similarities.append(sim)
-    
-    similarities = np.array(similarities)
+    # Every pair at once: normalize the rows, one GEMM, keep the upper triangle (i < j)
+    sample_embs = sample_embs / np.linalg.norm(sample_embs, axis=1, keepdims=True)
+    similarities = (sample_embs @ sample_embs.T)[np.triu_indices(n_samples, k=1)]
     
     print(f"\nPairwise Similarity Statistics:")
     print(f"  Mean: {np.mean(similarities):.4f}")